@@ -0,0 +1,89 @@
+"""Disk-backed cache for per-month aggregates."""
+import os
+import pickle
+import shutil
+
+from atomic_file import atomic_write
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+class AggregateCache:
+    """Pickled aggregates keyed by month, kind, content fingerprint and config."""
+
+    def __init__(self, root, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+
+    def _path(self, month, kind, fingerprint, config_hash):
+        return os.path.join(self.root, month, f"{kind}-{fingerprint}-{config_hash}.pkl")
+
+    def get(self, month, kind, fingerprint, config_hash):
+        """Cached value, or None on a miss or unreadable entry."""
+        path = self._path(month, kind, fingerprint, config_hash)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            return None
+        try:
+            os.utime(path)  # mark as recently used for eviction
+        except OSError:
+            pass
+        return value
+
+    def has(self, month, kind, fingerprint, config_hash):
+        """Whether an entry exists (without loading it)."""
+        return os.path.exists(self._path(month, kind, fingerprint, config_hash))
+
+    def put(self, month, kind, fingerprint, config_hash, value):
+        """Store a value, dropping older entries of the same kind for the month."""
+        path = self._path(month, kind, fingerprint, config_hash)
+        month_dir = os.path.dirname(path)
+        os.makedirs(month_dir, exist_ok=True)
+        for name in os.listdir(month_dir):
+            # Temp files are another writer's entry in progress
+            if name.startswith(f"{kind}-") and name.endswith(".pkl") and name != os.path.basename(path):
+                try:
+                    os.remove(os.path.join(month_dir, name))
+                except OSError:
+                    pass
+        def dump(tmp):
+            with open(tmp, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        atomic_write(path, dump)
+        self.evict()
+        return value
+
+    def invalidate_month(self, month):
+        """Drop every cached aggregate of one month."""
+        shutil.rmtree(os.path.join(self.root, month), ignore_errors=True)
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        total = 0
+        if not os.path.isdir(self.root):
+            return
+        for month in os.listdir(self.root):
+            month_dir = os.path.join(self.root, month)
+            if not os.path.isdir(month_dir):
+                continue
+            for name in os.listdir(month_dir):
+                if not name.endswith(".pkl"):
+                    continue
+                path = os.path.join(month_dir, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
@@ -0,0 +1,17 @@
+import os
+import threading
+
+
+def atomic_write(path, write_fn):
+    """Write ``path`` via ``write_fn(tmp_path)`` and a rename, so readers never see a partial file."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    # One temp name per writer thread, so concurrent writers never share a file
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        write_fn(tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return path
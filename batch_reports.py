@@ -0,0 +1,91 @@
+"""Generate the monthly Excel reports without opening the dashboard."""
+import argparse
+import os
+import sys
+import time
+
+import metro_core as core
+import month_pool
+from atomic_file import atomic_write
+
+def report_filename(month):
+    return f"metro_report_{month}.xlsx"
+
+
+def select_months(first=None, last=None):
+    """Uploaded months from ``first`` to ``last`` (either end open)."""
+    uploaded = core.get_uploaded_months()
+    if not uploaded:
+        return []
+    span = set(core.span_months(first or uploaded[0], last or uploaded[-1]))
+    return [m for m in uploaded if m in span]
+
+
+def write_report(task):
+    """Worker: build (or reuse) one month's workbook and write it to the output folder."""
+    month, data_dir, out_dir, rebuild = task
+    core.configure(data_dir)
+    start = time.perf_counter()
+    result = {"month": month, "path": None, "reused": False, "error": None}
+    try:
+        is_valid, _, error_msg = core.month_validation(month)
+        if not is_valid:
+            raise ValueError(error_msg.splitlines()[0])
+        report = None if rebuild else core.month_report(month)
+        result["reused"] = report is not None
+        if report is None:
+            report = core.build_month_report(month)
+        if report is None:
+            raise ValueError(f"No data stored for {month}")
+        path = os.path.join(out_dir, report_filename(month))
+        def dump(tmp):
+            with open(tmp, "wb") as f:
+                f.write(report)
+        atomic_write(path, dump)
+        result["path"] = path
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def generate(months, out_dir, workers=month_pool.DEFAULT_WORKERS, rebuild=False):
+    """Write the reports of ``months`` to ``out_dir``; returns one result dict per month."""
+    os.makedirs(out_dir, exist_ok=True)
+    # Rollup rows feed every report's trend sheet; fill in missing ones once, up front
+    core.load_rollup()
+    tasks = [(m, core.BASE_DATA_DIR, out_dir, rebuild) for m in months]
+    results = []
+    for _, result in month_pool.imap(write_report, tasks, workers, processes=True):
+        if result["error"]:
+            print(f"{result['month']}  FAILED  {result['error']}")
+        else:
+            source = "stored" if result["reused"] else "built"
+            print(f"{result['month']}  {result['seconds']:6.1f}s  {source:<6}  {result['path']}")
+        results.append(result)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write the monthly Excel reports of the uploaded months.")
+    parser.add_argument("--from", dest="first", metavar="YYYY-MM", help="first month (default: earliest uploaded)")
+    parser.add_argument("--to", dest="last", metavar="YYYY-MM", help="last month (default: latest uploaded)")
+    parser.add_argument("--out", required=True, help="folder the workbooks are written to")
+    parser.add_argument("--data-dir", default=core.DEFAULT_DATA_DIR, help="the dashboard's data folder")
+    parser.add_argument("--workers", type=int, default=month_pool.DEFAULT_WORKERS, help="months built at once")
+    parser.add_argument("--rebuild", action="store_true", help="rebuild workbooks even if stored ones are current")
+    args = parser.parse_args()
+
+    out_dir = os.path.abspath(args.out)
+    core.configure(os.path.abspath(args.data_dir))
+
+    months = select_months(args.first, args.last)
+    if not months:
+        print("No uploaded months in the requested range")
+        sys.exit(0)
+    start = time.perf_counter()
+    results = generate(months, out_dir, args.workers, args.rebuild)
+    failed = [r for r in results if r["error"]]
+    print(f"{len(results) - len(failed)} of {len(results)} reports written to {out_dir} "
+          f"in {time.perf_counter() - start:.1f}s")
+    sys.exit(1 if failed else 0)
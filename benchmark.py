@@ -0,0 +1,183 @@
+"""Benchmarks for the metrics pipeline on synthetic months."""
+import argparse
+import gc
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import metro_core as core
+import month_store
+from synthetic_rides import make_rides
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DASHBOARD = os.path.join(HERE, "metro_dashboard.py")
+DEFAULT_ROWS = [10_000, 100_000]
+MONTH = "2025-11"
+
+# Run in a fresh interpreter: argv is the dashboard path and the number of reruns
+STARTUP_SCRIPT = """
+import json, logging, sys, time
+logging.disable(logging.WARNING)
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file(sys.argv[1], default_timeout=600)
+start = time.perf_counter(); app.run(); cold = time.perf_counter() - start
+warm = []
+for _ in range(int(sys.argv[2])):
+    start = time.perf_counter(); app.run(); warm.append(time.perf_counter() - start)
+print(json.dumps({"cold": cold, "warm": sorted(warm)[len(warm) // 2], "error": str(app.exception) if app.exception else None}))
+"""
+
+
+def measure(setup, run, memory=True):
+    """``(seconds, peak_bytes)`` of ``run(*setup())``; setup is not measured."""
+    args = setup()
+    gc.collect()
+    start = time.perf_counter()
+    run(*args)
+    seconds = time.perf_counter() - start
+
+    peak = None
+    if memory:
+        args = setup()
+        gc.collect()
+        tracemalloc.start()
+        try:
+            run(*args)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return seconds, peak
+
+
+def build_stages(rides):
+    """``{name: (setup, run)}`` for every benchmarked stage, in pipeline order."""
+    raw = rides.astype(str).where(rides.notna())   # text cells, as read from an upload
+    clean = core.clean_df(raw.copy())
+    located = core.assign_points(clean.copy())
+    stored = core.add_station_ids(located.copy())
+    month_store.write_month(core.BASE_DATA_DIR, MONTH, stored)
+    core.CATALOG.index_month(MONTH)
+
+    def cold(*args):
+        """Setup that clears the in-memory caches and passes ``args`` through."""
+        def setup():
+            core.clear_caches()
+            return args
+        return setup
+
+    def uncached():
+        """Setup that also drops the month's stored aggregates, so they are rebuilt from rows."""
+        core.clear_caches()
+        core.AGG_CACHE.invalidate_month(MONTH)
+        return (MONTH,)
+
+    def for_export():
+        core.clear_caches()
+        core.load_rollup()   # trend rows are built by the upload, not the export
+        return (core.month_summary(MONTH),)
+
+    return {
+        "clean_df": (lambda: (raw.copy(),), core.clean_df),
+        "find_nearest_station": (lambda: (clean.copy(),), core.assign_points),
+        "add_station_ids": (lambda: (located.copy(),), core.add_station_ids),
+        "write_month": (
+            cold(stored),
+            lambda df: month_store.write_month(core.BASE_DATA_DIR, MONTH, df),
+        ),
+        "read_month_rows": (cold(MONTH), core.read_month_rows),
+        "month_state": (uncached, core.month_state),
+        "export_month_to_excel": (for_export, lambda summary: core.export_month_to_excel(summary, MONTH)),
+    }
+
+
+def run_benchmarks(rows_list, stages=None, memory=True, seed=0):
+    """Benchmark each size; returns a list of result dicts."""
+    results = []
+    for n_rows in rows_list:
+        data_dir = tempfile.mkdtemp(prefix="metro-bench-")
+        try:
+            core.configure(data_dir)
+            start = time.perf_counter()
+            rides = make_rides(n_rows, MONTH, seed)
+            print(f"\n{n_rows:,} rows (generated in {time.perf_counter() - start:.1f}s)")
+            print(f"{'stage':<28}{'seconds':>10}{'peak MB':>10}")
+            for name, (setup, run) in build_stages(rides).items():
+                if stages and name not in stages:
+                    continue
+                seconds, peak = measure(setup, run, memory)
+                peak_mb = peak / 2**20 if peak is not None else None
+                print(f"{name:<28}{seconds:>10.3f}{peak_mb if peak_mb is not None else float('nan'):>10.1f}")
+                results.append({"rows": n_rows, "stage": name, "seconds": seconds, "peak_mb": peak_mb})
+        finally:
+            shutil.rmtree(data_dir, ignore_errors=True)
+    return results
+
+
+def _startup_dir(n_rows, seed):
+    """Working folder for the page, with one stored month unless ``n_rows`` is 0."""
+    work = tempfile.mkdtemp(prefix="metro-startup-")
+    if n_rows:
+        # The page opens on January of the latest year; store that month as an upload would
+        month = f"{core.AVAILABLE_YEARS[-1]}-01"
+        core.configure(os.path.join(work, core.DEFAULT_DATA_DIR))
+        csv = make_rides(n_rows, month, seed).to_csv(index=False).encode("utf-8")
+        core.ingest_upload(io.BytesIO(csv), "csv", month)
+        core.build_month_report(month)
+    return work
+
+
+def run_startup(rows_list, processes=3, reruns=5, seed=0):
+    """Median cold (first run in a new process) and warm (rerun) page times, empty and per size."""
+    results = []
+    print(f"{'page':<20}{'cold s':>10}{'warm s':>10}")
+    for n_rows in [0] + list(rows_list):
+        work = _startup_dir(n_rows, seed)
+        try:
+            runs = []
+            for _ in range(processes):
+                out = subprocess.run(
+                    [sys.executable, "-c", STARTUP_SCRIPT, DASHBOARD, str(reruns)],
+                    cwd=work, capture_output=True, text=True, check=True,
+                    env={**os.environ, "PYTHONPATH": HERE},
+                )
+                run = json.loads(out.stdout.strip().splitlines()[-1])
+                if run["error"]:
+                    raise RuntimeError(run["error"])
+                runs.append(run)
+        finally:
+            shutil.rmtree(work, ignore_errors=True)
+        label = f"{n_rows:,} rows" if n_rows else "no data"
+        cold = sorted(r["cold"] for r in runs)[len(runs) // 2]
+        warm = sorted(r["warm"] for r in runs)[len(runs) // 2]
+        print(f"{label:<20}{cold:>10.3f}{warm:>10.3f}")
+        results.append({"rows": n_rows, "stage": "startup (cold)", "seconds": cold, "peak_mb": None})
+        results.append({"rows": n_rows, "stage": "startup (warm)", "seconds": warm, "peak_mb": None})
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the metrics pipeline on synthetic rides.")
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS, help="month sizes to run")
+    parser.add_argument("--stages", nargs="+", help="only these stages")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="append results as JSON lines to this file")
+    parser.add_argument("--startup", action="store_true", help="time the dashboard page's cold and warm runs instead")
+    args = parser.parse_args()
+
+    if args.startup:
+        results = run_startup(args.rows, seed=args.seed)
+    else:
+        results = run_benchmarks(args.rows, args.stages, not args.no_memory, args.seed)
+    if args.output:
+        stamp = datetime.now().isoformat(timespec="seconds")
+        with open(args.output, "a", encoding="utf-8") as f:
+            for record in results:
+                f.write(json.dumps({"timestamp": stamp, **record}) + "\n")
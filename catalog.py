@@ -0,0 +1,179 @@
+"""Catalog of the months in the data store (data/catalog.json)."""
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+import month_store
+import xlsx_reader
+from atomic_file import atomic_write
+
+CATALOG_FILE = "catalog.json"
+VERSION = 1
+
+
+def file_sha1(path, block=1 << 20):
+    """SHA-1 of a file's bytes."""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(block), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _file_entry(path, previous=None):
+    st = os.stat(path)
+    if previous and previous["bytes"] == st.st_size and previous["mtime_ns"] == st.st_mtime_ns:
+        return previous
+    entry = {"name": os.path.basename(path), "bytes": st.st_size, "mtime_ns": st.st_mtime_ns}
+    entry["sha1"] = file_sha1(path)
+    if path.endswith(f".{month_store.STORE_EXT}"):
+        import pyarrow.parquet as pq
+
+        entry["rows"] = pq.ParquetFile(path).metadata.num_rows
+    else:
+        entry["rows"] = None   # legacy files are not parsed just to count rows
+    return entry
+
+
+def _columns(path, ext):
+    if ext == month_store.STORE_EXT:
+        import pyarrow.parquet as pq
+
+        return pq.read_schema(path).names
+    if ext == "csv":
+        return [xlsx_reader.normalize_header(c) for c in pd.read_csv(path, nrows=0).columns]
+    return xlsx_reader.read_header(path)
+
+
+class Catalog:
+    """Manifest of stored months under ``base_dir`` for the given years."""
+
+    def __init__(self, base_dir, years, required_columns=()):
+        self.base_dir = base_dir
+        self.years = [str(y) for y in years]
+        self.required_columns = list(required_columns)
+        self.path = os.path.join(base_dir, CATALOG_FILE)
+        self._lock = threading.RLock()
+        self._data = None
+        self._mtime = None
+
+    # -- persistence -----------------------------------------------------
+    def _read(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if self._data is None or mtime != self._mtime:
+            data = None
+            if mtime is not None:
+                try:
+                    with open(self.path, encoding="utf-8") as f:
+                        data = json.load(f)
+                except (OSError, ValueError):
+                    data = None
+            if not data or data.get("version") != VERSION:
+                data = {"version": VERSION, "dirs": {}, "months": {}}
+            self._data, self._mtime = data, mtime
+        return self._data
+
+    def _write(self, data):
+        def dump(tmp):
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=1, sort_keys=True)
+        atomic_write(self.path, dump)
+        self._data, self._mtime = data, os.stat(self.path).st_mtime_ns
+
+    def _dir_mtime(self, year):
+        try:
+            return os.stat(os.path.join(self.base_dir, year)).st_mtime_ns
+        except OSError:
+            return None
+
+    # -- indexing --------------------------------------------------------
+    def _index(self, month, previous=None):
+        """Fresh entry for a month from its files, None if it has none."""
+        path, ext = month_store.find_month_file(self.base_dir, month)
+        if path is None:
+            return None
+        old_files = {f["name"]: f for f in (previous or {}).get("files", [])}
+        paths = month_store.month_files(self.base_dir, month)
+        files = [_file_entry(p, old_files.get(os.path.basename(p))) for p in paths]
+        unchanged = previous is not None and previous["format"] == ext and files == previous["files"]
+        if unchanged:
+            return previous
+
+        columns = _columns(path, ext)
+        missing = [c for c in self.required_columns if c not in columns]
+        rows = [f["rows"] for f in files]
+        return {
+            "path": os.path.relpath(path, self.base_dir),
+            "format": ext,
+            "files": files,
+            "rows": sum(rows) if None not in rows else None,
+            "bytes": sum(f["bytes"] for f in files),
+            "hash": hashlib.sha1("|".join(f["sha1"] for f in files).encode("ascii")).hexdigest()[:16],
+            "columns": columns,
+            "valid": not missing,
+            "missing": missing,
+            "indexed": datetime.now().isoformat(timespec="seconds"),
+        }
+
+    def refresh(self):
+        """The manifest, re-indexing year folders changed since they were recorded."""
+        with self._lock:
+            data = self._read()
+            stale = [y for y in self.years if data["dirs"].get(y) != self._dir_mtime(y)]
+            if not stale:
+                return data
+            data = json.loads(json.dumps(data))   # never mutate the cached copy in place
+            for year in stale:
+                present = month_store.list_months(self.base_dir, [year])
+                for month in [m for m in data["months"] if m.startswith(f"{year}-") and m not in present]:
+                    del data["months"][month]
+                for month in present:
+                    entry = self._index(month, data["months"].get(month))
+                    if entry is not None:
+                        data["months"][month] = entry
+                data["dirs"][year] = self._dir_mtime(year)
+            self._write(data)
+            return data
+
+    def index_month(self, month):
+        """Re-index one month after the app wrote or deleted its files."""
+        with self._lock:
+            data = json.loads(json.dumps(self.refresh()))
+            entry = self._index(month, data["months"].get(month))
+            if entry is None:
+                data["months"].pop(month, None)
+            else:
+                data["months"][month] = entry
+            data["dirs"][month.split("-")[0]] = self._dir_mtime(month.split("-")[0])
+            self._write(data)
+            return entry
+
+    # -- queries ---------------------------------------------------------
+    def months(self, years=None):
+        """Sorted stored months, optionally only of ``years``."""
+        prefixes = tuple(f"{y}-" for y in years) if years else None
+        months = self.refresh()["months"]
+        return sorted(m for m in months if prefixes is None or m.startswith(prefixes))
+
+    def entry(self, month):
+        """A month's catalog entry, None if it is not stored."""
+        return self.refresh()["months"].get(month) if month else None
+
+    def fingerprint(self, month):
+        """Content hash of a month's files, for cache keys."""
+        entry = self.entry(month)
+        return entry["hash"] if entry else None
+
+    def file_path(self, month):
+        """``(path, format)`` of the month file, ``(None, None)`` if not stored."""
+        entry = self.entry(month)
+        if entry is None:
+            return None, None
+        return os.path.join(self.base_dir, entry["path"]), entry["format"]
@@ -0,0 +1,216 @@
+"""Small on-disk job queue with a background worker thread."""
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from atomic_file import atomic_write
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+KEEP_FINISHED = 50
+
+
+def _now():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        return True
+    return True
+
+
+class JobQueue:
+    """Jobs stored as ``<root>/<id>.json``; ids sort in creation order."""
+
+    def __init__(self, root, keep_finished=KEEP_FINISHED):
+        self.root = root
+        self.keep_finished = keep_finished
+        self._lock = threading.Lock()
+
+    def _path(self, job_id, suffix=".json"):
+        return os.path.join(self.root, f"{job_id}{suffix}")
+
+    def _save(self, job):
+        def dump(tmp):
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(job, f, ensure_ascii=False)
+        atomic_write(self._path(job["id"]), dump)
+        return job
+
+    def jobs(self):
+        """Every job, oldest first."""
+        if not os.path.isdir(self.root):
+            return []
+        out = []
+        for name in sorted(os.listdir(self.root)):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.root, name), encoding="utf-8") as f:
+                    out.append(json.load(f))
+            except (OSError, ValueError):
+                continue   # being replaced right now
+        return out
+
+    def get(self, job_id):
+        """One job by id, None if it no longer exists."""
+        try:
+            with open(self._path(job_id), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def active(self, kind=None, **params):
+        """Queued or running jobs, optionally of one kind and parameters."""
+        return [
+            job for job in self.jobs()
+            if job["status"] in (QUEUED, RUNNING)
+            and (kind is None or job["kind"] == kind)
+            and all(job["params"].get(k) == v for k, v in params.items())
+        ]
+
+    def enqueue(self, kind, **params):
+        """Queue a job; an identical job that has not started yet is reused."""
+        with self._lock:
+            for job in self.jobs():
+                if job["status"] == QUEUED and job["kind"] == kind and job["params"] == params:
+                    return job
+            job = {
+                "id": f"{time.time_ns():020d}-{uuid.uuid4().hex[:6]}",
+                "kind": kind,
+                "params": params,
+                "status": QUEUED,
+                "created": _now(),
+                "started": None,
+                "finished": None,
+                "progress": 0.0,
+                "step": "",
+                "error": None,
+            }
+            return self._save(job)
+
+    def claim(self, owner=""):
+        """Mark the oldest queued job as running by ``owner`` in this process and return it (None if idle)."""
+        for job in self.jobs():
+            if job["status"] != QUEUED:
+                continue
+            try:
+                fd = os.open(self._path(job["id"], ".lock"), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                continue   # another process got it
+            with os.fdopen(fd, "w") as f:
+                f.write(f"{os.getpid()} {owner}")
+            current = self.get(job["id"])
+            if current is None or current["status"] != QUEUED:
+                # Finished by another process since it was listed
+                os.remove(self._path(job["id"], ".lock"))
+                continue
+            return self.update(current, status=RUNNING, started=_now())
+        return None
+
+    def update(self, job, **changes):
+        job.update(changes)
+        return self._save(job)
+
+    def finish(self, job, error=None):
+        """Record the outcome, release the job's lock and prune old finished jobs."""
+        if error is None:
+            self.update(job, status=DONE, finished=_now(), progress=1.0, step="")
+        else:
+            self.update(job, status=FAILED, finished=_now(), error=error)
+        try:
+            os.remove(self._path(job["id"], ".lock"))
+        except OSError:
+            pass
+        self.prune()
+
+    def recover(self, owner=None):
+        """Queue again the jobs whose runner is gone (e.g. after a restart); ``owner`` is this process's runner."""
+        for job in self.jobs():
+            if job["status"] != RUNNING:
+                continue
+            lock = self._path(job["id"], ".lock")
+            try:
+                with open(lock, encoding="utf-8") as f:
+                    pid, _, holder = f.read().partition(" ")
+                pid = int(pid or 0)
+            except (OSError, ValueError):
+                pid, holder = 0, ""
+            # A restarted app often gets the same pid back, so its own pid only counts with its token
+            if not pid or not _pid_alive(pid) or (pid == os.getpid() and holder != owner):
+                try:
+                    os.remove(lock)
+                except OSError:
+                    pass
+                self.update(job, status=QUEUED, started=None, progress=0.0, step="")
+
+    def prune(self):
+        """Keep only the ``keep_finished`` most recent finished jobs."""
+        finished = [job for job in self.jobs() if job["status"] in (DONE, FAILED)]
+        for job in finished[:max(0, len(finished) - self.keep_finished)]:
+            try:
+                os.remove(self._path(job["id"]))
+            except OSError:
+                pass
+
+
+class JobRunner:
+    """Runs queued jobs one at a time on a daemon thread."""
+
+    def __init__(self, queue, handlers, poll_seconds=5.0):
+        self.queue = queue
+        self.handlers = handlers
+        self.poll_seconds = poll_seconds
+        self.token = uuid.uuid4().hex   # marks the locks of the jobs this runner claimed
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self.queue.recover(self.token)
+            self._thread = threading.Thread(target=self._loop, name="job-runner", daemon=True)
+            self._thread.start()
+        return self
+
+    def wake(self):
+        """Look for new jobs now instead of at the next poll."""
+        self._wake.set()
+
+    def run_pending(self):
+        """Run queued jobs on the calling thread until none is left; returns how many ran."""
+        ran = 0
+        while True:
+            job = self.queue.claim(self.token)
+            if job is None:
+                return ran
+            self._run(job)
+            ran += 1
+
+    def _loop(self):
+        while True:
+            self.run_pending()
+            self._wake.wait(self.poll_seconds)
+            self._wake.clear()
+
+    def _run(self, job):
+        handler = self.handlers.get(job["kind"])
+        if handler is None:
+            self.queue.finish(job, error=f"No handler for job kind {job['kind']!r}")
+            return
+
+        def progress(done, total, step=""):
+            self.queue.update(job, progress=done / total if total else 0.0, step=step)
+
+        try:
+            handler(progress=progress, **job["params"])
+        except Exception as e:
+            self.queue.finish(job, error=f"{type(e).__name__}: {e}")
+        else:
+            self.queue.finish(job)
@@ -0,0 +1,1321 @@
+"""Data and report logic of the metro dashboard, without Streamlit."""
+import copy
+import functools
+import hashlib
+import io
+import json
+import logging
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import agg_cache
+import catalog
+import jobs
+import month_pool
+import month_store
+import perf
+import rollup
+import user_sketch
+import xlsx_reader
+from station_index import POINTS_FILE, load_point_index
+
+log = logging.getLogger(__name__)
+
+# ===============================
+# CONFIG
+# ===============================
+# The station config ships with the app (as does station_index.POINTS_FILE),
+# so it is found next to this module whatever the working directory
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DATA_DIR = "data"
+CONFIG_FILE = os.path.join(HERE, "config", "stations.json")
+AVAILABLE_YEARS = [2025, 2026]
+MONTH_WORKERS = month_pool.DEFAULT_WORKERS   # months read/parsed at once
+
+# Required columns in uploaded data
+REQUIRED_COLUMNS = {
+    "Start": "Station where ride started",
+    "End": "Station where ride ended",
+    "User Id": "Unique identifier for user",
+    "Signup Local Date": "Date user signed up",
+    "Start Date Local": "Date and time ride started",
+    "Duration": "Ride duration in minutes",
+    "Rating": "User rating (1-5 stars)"
+}
+
+def configure(data_dir=DEFAULT_DATA_DIR):
+    """Point storage (months, aggregates, rollup, catalog, jobs) at ``data_dir``."""
+    global BASE_DATA_DIR, AGG_CACHE, ROLLUP_FILE, CATALOG, JOB_QUEUE
+    BASE_DATA_DIR = data_dir
+    AGG_CACHE = agg_cache.AggregateCache(os.path.join(data_dir, "_aggregates"))
+    ROLLUP_FILE = os.path.join(data_dir, "rollup.csv")
+    # Manifest of stored months: listing, cache keys and schema checks
+    CATALOG = catalog.Catalog(data_dir, AVAILABLE_YEARS, REQUIRED_COLUMNS)
+    JOB_QUEUE = jobs.JobQueue(os.path.join(data_dir, "_jobs"))
+
+configure()
+
+def ensure_dirs():
+    """Create the data and config folders the app writes to."""
+    os.makedirs(os.path.dirname(CONFIG_FILE), exist_ok=True)
+    for year in AVAILABLE_YEARS:
+        os.makedirs(os.path.join(BASE_DATA_DIR, str(year)), exist_ok=True)
+
+START_COL = "Start"
+END_COL = "End"
+USER_COL = "User Id"
+SIGNUP_COL = "Signup Local Date"
+START_DATE_COL = "Start Date Local"
+DURATION_COL = "Duration"
+RATING_COL = "Rating"
+
+# Optional coordinate columns; when present rides are matched to metro_points.csv
+START_LAT_COL, START_LON_COL = "Start Lat", "Start Long"
+END_LAT_COL, END_LON_COL = "Stop Lat", "Stop Long"
+START_POINT_COL = "Start Point"
+END_POINT_COL = "End Point"
+POINT_RADIUS = 150  # meters
+
+# Station columns resolved once from the Start/End text (categorical labels)
+START_STATION_COL = "Start Station"
+END_STATION_COL = "End Station"
+STATION_LABEL_SEP = " + "
+
+# User segmentation thresholds
+LIGHT_USER_MIN = 2
+LIGHT_USER_MAX = 5
+HEAVY_USER_MIN = 6
+
+# Rating thresholds
+MIN_RATING = 1
+MAX_RATING = 5
+POSITIVE_RATING_MIN = 4
+
+# ===============================
+# STATION CONFIG MANAGEMENT
+# ===============================
+DEFAULT_STATIONS = {
+    "Koleyet El Banat": "كليه البنات",
+    "Safaa Hegazy": "صفاء",
+    "Al-Ahram": "الاهرام",
+    "Heliopolis": "هليوبوليس",
+    "Alf Maskan": "الف مسكن",
+    "Haroun": "هارون",
+}
+
+def load_stations():
+    """Load station configuration from file or use defaults."""
+    if os.path.exists(CONFIG_FILE):
+        try:
+            with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            log.error("Error loading station config: %s", e)
+            return DEFAULT_STATIONS
+    return DEFAULT_STATIONS
+
+def save_stations(stations):
+    """Save station configuration to file (raises ``OSError`` if it cannot be written)."""
+    os.makedirs(os.path.dirname(CONFIG_FILE), exist_ok=True)
+    with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
+        json.dump(stations, f, ensure_ascii=False, indent=2)
+
+def _config_mtime():
+    try:
+        return os.stat(CONFIG_FILE).st_mtime_ns
+    except OSError:
+        return None
+
+def refresh_stations():
+    """Re-read the station config if its file changed; True if the stations changed."""
+    global STATIONS, _stations_mtime
+    mtime = _config_mtime()
+    if mtime == _stations_mtime:
+        return False
+    stations = load_stations()
+    _stations_mtime = mtime
+    if stations == STATIONS:
+        return False
+    STATIONS = dict(stations)
+    clear_caches()
+    return True
+
+# Read once here; refresh_stations() re-reads it only after the file changed
+_stations_mtime = _config_mtime()
+STATIONS = dict(load_stations())
+
+# ===============================
+# CACHING
+# ===============================
+_MEMOIZED = []
+_CACHE = None   # (decorator factory, default options) installed by use_cache
+
+def _bind(func, options):
+    if _CACHE is None:
+        return perf.timed()(func)
+    cache, defaults = _CACHE
+    return perf.cached(cache(**{**defaults, **options}))(func)
+
+def memoized(**options):
+    """Cache a function with the installed cache (``max_entries``, ``ttl``); plain calls until then."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return wrapper.impl(*args, **kwargs)
+        wrapper.func, wrapper.options = func, options
+        wrapper.impl = _bind(func, options)
+        _MEMOIZED.append(wrapper)
+        return wrapper
+    return decorate
+
+def use_cache(cache, **defaults):
+    """Cache every memoized function with ``cache(**options)``, e.g. ``st.cache_data``."""
+    global _CACHE
+    if _CACHE == (cache, defaults):
+        return
+    _CACHE = (cache, defaults)
+    for wrapper in _MEMOIZED:
+        wrapper.impl = _bind(wrapper.func, wrapper.options)
+
+def clear_caches():
+    """Drop every memoized result (after the station config or stored data changed)."""
+    for wrapper in _MEMOIZED:
+        clear = getattr(wrapper.impl, "clear", None)
+        if clear is not None:
+            clear()
+
+# ===============================
+# HELPERS
+# ===============================
+def get_months_for_year(year):
+    """Generate list of months for a given year."""
+    return [f"{year}-{str(i).zfill(2)}" for i in range(1, 13)]
+
+@perf.timed()
+def validate_dataframe(df):
+    """Validate that dataframe contains all required columns."""
+    missing = [col for col in REQUIRED_COLUMNS.keys() if col not in df.columns]
+    
+    if missing:
+        error_msg = f"Missing required columns: {', '.join(missing)}\n\n"
+        error_msg += "Required columns:\n"
+        for col, desc in REQUIRED_COLUMNS.items():
+            status = "✓" if col in df.columns else "✗"
+            error_msg += f"{status} {col}: {desc}\n"
+        return False, missing, error_msg
+    
+    return True, [], ""
+
+def clean_df(df):
+    """Clean and standardize dataframe columns and data types."""
+    df.columns = (
+        df.columns.astype(str)
+        .str.replace("\xa0", " ", regex=False)
+        .str.strip()
+    )
+    
+    for col in [START_DATE_COL, SIGNUP_COL]:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], errors="coerce")
+    
+    if DURATION_COL in df.columns:
+        df[DURATION_COL] = pd.to_numeric(df[DURATION_COL], errors="coerce").astype("float64")
+    
+    if RATING_COL in df.columns:
+        df[RATING_COL] = pd.to_numeric(df[RATING_COL], errors="coerce").astype("float64")
+    
+    for col in [START_LAT_COL, START_LON_COL, END_LAT_COL, END_LON_COL]:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("float64")
+    
+    if USER_COL in df.columns:
+        df[USER_COL] = normalize_user_ids(df[USER_COL])
+    
+    return df
+
+def normalize_user_ids(ids):
+    """User ids as text ("123", never "123.0") so months and chunks agree."""
+    if pd.api.types.is_numeric_dtype(ids) and not pd.api.types.is_bool_dtype(ids):
+        try:
+            ids = ids.astype("Int64")
+        except (TypeError, ValueError):
+            pass
+    elif ids.dtype == object:
+        # Spreadsheet cells mix text ids with numbers read as 123.0
+        ids = ids.map(lambda v: int(v) if isinstance(v, float) and v.is_integer() else v)
+    return ids.astype(str).str.strip().where(ids.notna())
+
+def assign_points(df):
+    """Add nearest docking point columns when the data carries coordinates."""
+    coord_cols = [START_LAT_COL, START_LON_COL, END_LAT_COL, END_LON_COL]
+    if not os.path.exists(POINTS_FILE) or not all(c in df.columns for c in coord_cols):
+        return df
+    n = len(df)
+    coords = df[coord_cols].apply(pd.to_numeric, errors="coerce").to_numpy(float)
+    lats = np.concatenate([coords[:, 0], coords[:, 2]])
+    lons = np.concatenate([coords[:, 1], coords[:, 3]])
+    index = load_point_index(POINTS_FILE, POINT_RADIUS)
+    points = index.nearest_names(lats, lons)
+    categories = pd.unique(index.names)
+    df[START_POINT_COL] = pd.Categorical(points[:n], categories=categories)
+    df[END_POINT_COL] = pd.Categorical(points[n:], categories=categories)
+    return df
+
+# Raw Start/End string -> station label, per stations config
+_station_lookup = {}
+
+def stations_signature():
+    """Stable fingerprint of the current station config."""
+    return json.dumps(STATIONS, sort_keys=True, ensure_ascii=False)
+
+def resolve_stations(values):
+    """Map raw station text to a categorical station label per row, matching each distinct string once."""
+    lookup = _station_lookup.setdefault(stations_signature(), {})
+    codes, uniques = pd.factorize(pd.Series(values))
+    
+    unseen = [u for u in uniques if u not in lookup]
+    if unseen:
+        text = pd.Series(unseen, dtype=object).astype(str)
+        hits = {
+            name: text.str.contains(keyword, na=False, case=False).to_numpy()
+            for name, keyword in STATIONS.items()
+        }
+        for i, raw in enumerate(unseen):
+            matched = [name for name in STATIONS if hits[name][i]]
+            lookup[raw] = STATION_LABEL_SEP.join(matched) if matched else None
+    
+    labels = [lookup[u] for u in uniques]
+    categories = list(STATIONS) + sorted({l for l in labels if l and l not in STATIONS})
+    label_codes = pd.Categorical(labels, categories=categories).codes
+    row_codes = label_codes[codes] if len(label_codes) else codes
+    row_codes = np.where(codes >= 0, row_codes, -1)
+    return pd.Categorical.from_codes(row_codes, categories=categories)
+
+def stations_hash():
+    """Short hash of the station config, for cache keys."""
+    return hashlib.sha1(stations_signature().encode("utf-8")).hexdigest()[:16]
+
+def add_station_ids(df):
+    """Add Start/End station category columns unless current ones are stored."""
+    signature = stations_signature()
+    if (
+        df.attrs.get("stations_signature") == signature
+        and START_STATION_COL in df.columns
+        and END_STATION_COL in df.columns
+    ):
+        return df
+    if START_COL not in df.columns or END_COL not in df.columns:
+        return df
+    df[START_STATION_COL] = resolve_stations(df[START_COL])
+    df[END_STATION_COL] = resolve_stations(df[END_COL])
+    df.attrs["stations_signature"] = signature
+    return df
+
+def station_members(categories):
+    """Station ids (positions in STATIONS) covered by each station label."""
+    index = {name: i for i, name in enumerate(STATIONS)}
+    return [
+        [index[label]] if label in index
+        else [index[n] for n in label.split(STATION_LABEL_SEP) if n in index]
+        for label in categories
+    ]
+
+def station_mask(col, station):
+    """Boolean mask of rows whose station category column includes ``station``."""
+    station_id = list(STATIONS).index(station)
+    members = station_members(col.cat.categories)
+    codes = [c for c, m in enumerate(members) if station_id in m]
+    return col.cat.codes.isin(codes).to_numpy()
+
+def filter_by_station(df, col, station):
+    """Filter dataframe to rows whose station column includes ``station``."""
+    return df[station_mask(df[col], station)]
+
+def prev_month(month):
+    """Get previous month string."""
+    y, m = month.split("-")
+    y, m = int(y), int(m)
+    if m > 1:
+        return f"{y}-{m-1:02d}"
+    elif y > min(AVAILABLE_YEARS):
+        return f"{y-1}-12"
+    return None
+
+def trend_delta(current, previous):
+    """Calculate percentage change between current and previous values."""
+    if previous in (None, 0) or current is None:
+        return None
+    return (current - previous) / previous * 100
+
+def ride_histogram(rides_per_user):
+    """Riders per ride count: ``hist[k]`` riders took exactly ``k`` rides."""
+    return np.bincount(np.asarray(rides_per_user, dtype=np.int64), minlength=1)
+
+def segment_counts(hist):
+    """One-time, light and heavy rider counts from a rides-per-user histogram."""
+    hist = np.asarray(hist)
+    return {
+        "one_time": int(hist[1:2].sum()),
+        "light": int(hist[LIGHT_USER_MIN:LIGHT_USER_MAX + 1].sum()),
+        "heavy": int(hist[HEAVY_USER_MIN:].sum()),
+    }
+
+def ride_distribution(hist):
+    """Riders per ride count as a Series, for the ride counts that occur."""
+    hist = np.asarray(hist)
+    counts = np.flatnonzero(hist)
+    return pd.Series(hist[counts], index=counts)
+
+def apply_segments(summary):
+    """(Re)derive a summary's segment counts from its histograms with the current thresholds."""
+    for station, hist in summary["histograms"].items():
+        summary["stations"][station].update(segment_counts(hist))
+    return summary
+
+# ===============================
+# LOAD MONTH (CACHED)
+# ===============================
+def month_file_fingerprint(month):
+    """Content hash of a month's stored files (from the catalog), None if nothing is uploaded."""
+    return CATALOG.fingerprint(month)
+
+def month_validation(month):
+    """``validate_dataframe`` result for a stored month, from its catalogued columns."""
+    entry = CATALOG.entry(month)
+    if entry is None:
+        return False, list(REQUIRED_COLUMNS), f"No data stored for {month}"
+    if entry["valid"]:
+        return True, [], ""
+    return validate_dataframe(pd.DataFrame(columns=entry["columns"]))
+
+def read_month_rows(month, columns=None):
+    """Cleaned rows of a stored month with station ids (uncached; raises on unreadable files)."""
+    path, ext = CATALOG.file_path(month)
+    if path is None:
+        return None
+    
+    read_cols = None
+    if columns is not None:
+        read_cols = list(columns)
+        if {START_STATION_COL, END_STATION_COL} & set(columns):
+            # Raw text is needed if the stored ids predate the station config
+            read_cols += [START_COL, END_COL]
+    
+    if ext == month_store.STORE_EXT:
+        df = month_store.read_month(BASE_DATA_DIR, month, read_cols)
+    else:
+        df = assign_points(clean_df(month_store.read_legacy(path)))
+    if USER_COL in df.columns and pd.api.types.is_numeric_dtype(df[USER_COL]):
+        df[USER_COL] = normalize_user_ids(df[USER_COL])
+    df = add_station_ids(df)
+    return df[[c for c in columns if c in df.columns]] if columns else df
+
+def get_uploaded_months(year=None):
+    """Get list of months that have data uploaded."""
+    return CATALOG.months([year] if year else None)
+
+def migrate_legacy_months():
+    """Convert CSV/XLSX months from before the Parquet store; returns the converted months."""
+    months = [m for y in AVAILABLE_YEARS for m in get_months_for_year(y)]
+    converted = month_store.migrate_all(
+        BASE_DATA_DIR, months,
+        clean=lambda d: add_station_ids(assign_points(clean_df(d))),
+        validate=validate_dataframe,
+        workers=MONTH_WORKERS,
+    )
+    for m in converted:
+        CATALOG.index_month(m)
+        JOB_QUEUE.enqueue("precompute", month=m)
+    if converted:
+        clear_caches()
+    return converted
+
+def delete_month(month):
+    """Remove a stored month with its aggregates and rollup rows."""
+    month_store.delete_month(BASE_DATA_DIR, month)
+    CATALOG.index_month(month)
+    AGG_CACHE.invalidate_month(month)
+    rollup.drop_month(ROLLUP_FILE, month)
+
+# ===============================
+# STATION METRICS
+# ===============================
+def station_pairs(col):
+    """Expand a station category column into ``(rows, ids)`` pairs, once per station a row's label covers."""
+    codes = col.cat.codes.to_numpy()
+    members = station_members(col.cat.categories)
+    per_label = np.array([len(m) for m in members], dtype=np.intp)
+    ids_by_label = np.array([i for m in members for i in m], dtype=np.intp)
+    first = np.cumsum(per_label) - per_label
+    
+    per_row = np.where(codes >= 0, per_label[np.maximum(codes, 0)], 0) if len(members) else np.zeros(len(codes), dtype=np.intp)
+    rows = np.repeat(np.arange(len(codes)), per_row)
+    k = np.arange(len(rows)) - np.repeat(np.cumsum(per_row) - per_row, per_row)
+    ids = ids_by_label[first[codes[rows]] + k] if len(rows) else np.array([], dtype=np.intp)
+    return rows, ids
+
+# ===============================
+# CHART DATA
+# ===============================
+DAY_NAMES = ["Sunday", "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"]
+
+def compute_heatmap(heat):
+    """Heatmap rows (Day, Hour, Rides) from a station's 7x24 start counts."""
+    day, hour = np.nonzero(heat)
+    rows = pd.DataFrame({
+        "Day": np.array(DAY_NAMES)[day],
+        "Hour": hour.astype(np.int32),
+        "Rides": heat[day, hour],
+    })
+    return rows.sort_values(["Day", "Hour"], kind="stable").reset_index(drop=True)
+
+def compute_hourly_trend(heat):
+    """Hourly ride counts from a station's 7x24 start counts."""
+    counts = heat.sum(axis=0)
+    hours = np.flatnonzero(counts)
+    return pd.DataFrame({"Hour": hours.astype(np.int32), "Rides": counts[hours]})
+
+@perf.timed()
+def compute_monthly_trend(station):
+    """Compute monthly trend for a specific station across all uploaded months."""
+    rows = rollup.station_rows(load_rollup(), station)
+    return pd.DataFrame({
+        "Month": rows["Month"],
+        "Start Rides": rows["Rides Started"],
+    })
+
+def station_comparison(station_data):
+    """Comparison table from per-station metrics (of a month or a range)."""
+    rows = []
+    for station, data in station_data.items():
+        rows.append({
+            "Station": station,
+            "Total Starts": data["total_starts"],
+            "Total Riders": data["total_riders"],
+            "Avg Duration": data["avg_duration"],
+            "Avg Rating": data["avg_rating"],
+            "Heavy Users": data["heavy"],
+        })
+    
+    return pd.DataFrame(rows)
+
+# ===============================
+# MONTH AGGREGATES (DISK CACHE)
+# ===============================
+class MonthAggregator:
+    """Builds a month's aggregates (station metrics, heatmaps, daily arrays, totals) chunk by chunk."""
+    
+    # Totals that simply add up across chunks and months
+    ADDITIVE = (
+        "starts", "ends", "started_ended", "duration_sum", "duration_count",
+        "rating_sum", "rating_count", "positive", "heat", "total_rides",
+        "all_duration_sum", "all_duration_count", "all_rating_sum", "all_rating_count",
+    )
+    DAILY = (
+        "start_by_day", "end_by_day", "duration_sum_by_day", "duration_count_by_day",
+        "rating_sum_by_day", "rating_count_by_day",
+    )
+    
+    def __init__(self, month):
+        n = len(STATIONS)
+        self.period = pd.Period(month)
+        days = self.period.days_in_month
+        self.start_by_day = np.zeros((n, days), dtype=np.int64)
+        self.end_by_day = np.zeros((n, days), dtype=np.int64)
+        self.duration_sum_by_day = np.zeros((n, days))
+        self.duration_count_by_day = np.zeros((n, days), dtype=np.int64)
+        self.rating_sum_by_day = np.zeros((n, days))
+        self.rating_count_by_day = np.zeros((n, days), dtype=np.int64)
+        self.new_users_by_day = set()
+        self.starts = np.zeros(n, dtype=np.int64)
+        self.ends = np.zeros(n, dtype=np.int64)
+        self.started_ended = np.zeros(n, dtype=np.int64)
+        self.duration_sum = np.zeros(n)
+        self.duration_count = np.zeros(n, dtype=np.int64)
+        self.rating_sum = np.zeros(n)
+        self.rating_count = np.zeros(n, dtype=np.int64)
+        self.positive = np.zeros(n, dtype=np.int64)
+        self.heat = np.zeros((n, 7, 24), dtype=np.int64)
+        self.rides_per_user = None
+        self.new_users = set()
+        self.total_rides = 0
+        self.users = set()
+        self.all_duration_sum = 0.0
+        self.all_duration_count = 0
+        self.all_rating_sum = 0.0
+        self.all_rating_count = 0
+    
+    def state(self):
+        """Plain picklable state (no reference to this class)."""
+        return dict(self.__dict__)
+    
+    @classmethod
+    def from_state(cls, state):
+        aggregator = cls.__new__(cls)
+        aggregator.__dict__.update(state)
+        return aggregator
+    
+    @classmethod
+    def merge(cls, aggregators):
+        """One aggregator over several months' partial aggregates (no per-day arrays)."""
+        merged = cls.__new__(cls)
+        first, rest = aggregators[0], aggregators[1:]
+        merged.period = None
+        for name in cls.ADDITIVE:
+            total = copy.copy(getattr(first, name))
+            for a in rest:
+                total = total + getattr(a, name)
+            merged.__dict__[name] = total
+        for name in cls.DAILY:
+            merged.__dict__[name] = None
+        merged.new_users_by_day = set()
+        merged.new_users = set().union(*(a.new_users for a in aggregators))
+        merged.users = set().union(*(a.users for a in aggregators))
+        per_user = [a.rides_per_user for a in aggregators if a.rides_per_user is not None]
+        merged.rides_per_user = (
+            pd.concat(per_user).groupby(level=[0, 1]).sum().astype(np.int64) if per_user else None
+        )
+        return merged
+    
+    def _per_day(self, ids, day, weights=None):
+        n, days = self.start_by_day.shape
+        cell = ids * days + day
+        return np.bincount(cell, weights=weights, minlength=n * days).reshape(n, days)
+    
+    def update(self, df):
+        """Fold one cleaned chunk (with station id columns) into the totals."""
+        n = len(STATIONS)
+        start_rows, start_ids = station_pairs(df[START_STATION_COL])
+        end_rows, end_ids = station_pairs(df[END_STATION_COL])
+        self.starts += np.bincount(start_ids, minlength=n)
+        self.ends += np.bincount(end_ids, minlength=n)
+        both = np.intersect1d(start_rows * n + start_ids, end_rows * n + end_ids)
+        self.started_ended += np.bincount(both % n, minlength=n)
+        
+        duration = df[DURATION_COL].to_numpy(dtype=float, na_value=np.nan)
+        rating = pd.to_numeric(df[RATING_COL], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+        valid_rating = (rating >= MIN_RATING) & (rating <= MAX_RATING)
+        
+        d, r = duration[start_rows], rating[start_rows]
+        has_d, has_r = ~np.isnan(d), valid_rating[start_rows]
+        self.duration_sum += np.bincount(start_ids[has_d], weights=d[has_d], minlength=n)
+        self.duration_count += np.bincount(start_ids[has_d], minlength=n)
+        self.rating_sum += np.bincount(start_ids[has_r], weights=r[has_r], minlength=n)
+        self.rating_count += np.bincount(start_ids[has_r], minlength=n)
+        self.positive += np.bincount(start_ids[has_r & (r >= POSITIVE_RATING_MIN)], minlength=n)
+        
+        when = df[START_DATE_COL].iloc[start_rows]
+        dated = when.notna().to_numpy()
+        day = ((when.dt.dayofweek.to_numpy(dtype=float, na_value=0) + 1) % 7).astype(np.intp)
+        hour = when.dt.hour.to_numpy(dtype=float, na_value=0).astype(np.intp)
+        cell = (start_ids * 7 + day) * 24 + hour
+        self.heat += np.bincount(cell[dated], minlength=n * 7 * 24).reshape(n, 7, 24)
+        
+        # Daily arrays of the report, by day of month of the ride start
+        days = self.start_by_day.shape[1]
+        day = when.dt.day.to_numpy(dtype=float, na_value=0).astype(np.intp) - 1
+        in_month = dated & (day >= 0) & (day < days)
+        sid, day = start_ids[in_month], day[in_month]
+        self.start_by_day += self._per_day(sid, day)
+        dm, rm = has_d[in_month], has_r[in_month]
+        self.duration_sum_by_day += self._per_day(sid[dm], day[dm], d[in_month][dm])
+        self.duration_count_by_day += self._per_day(sid[dm], day[dm])
+        self.rating_sum_by_day += self._per_day(sid[rm], day[rm], r[in_month][rm])
+        self.rating_count_by_day += self._per_day(sid[rm], day[rm])
+        end_day = (df[START_DATE_COL].iloc[end_rows].dt.day.to_numpy(dtype=float, na_value=0) - 1).astype(np.intp)
+        end_in = (end_day >= 0) & (end_day < days)
+        self.end_by_day += self._per_day(end_ids[end_in], end_day[end_in])
+        
+        users = df[USER_COL].iloc[start_rows]
+        pairs = pd.DataFrame({"sid": start_ids, "user": users.to_numpy()})
+        chunk_counts = pairs.groupby(["sid", "user"]).size()
+        if self.rides_per_user is None:
+            self.rides_per_user = chunk_counts
+        else:
+            self.rides_per_user = chunk_counts.add(self.rides_per_user, fill_value=0).astype(np.int64)
+        signup = df[SIGNUP_COL].iloc[start_rows]
+        is_new = (
+            (signup.dt.year == self.period.year) & (signup.dt.month == self.period.month) & users.notna()
+        ).to_numpy()
+        self.new_users.update(zip(start_ids[is_new].tolist(), users[is_new].tolist()))
+        new_dated = is_new & in_month
+        self.new_users_by_day.update(zip(
+            start_ids[new_dated].tolist(),
+            signup[new_dated].dt.day.tolist(),
+            users[new_dated].tolist(),
+        ))
+        
+        self.total_rides += len(df)
+        self.users.update(df[USER_COL].dropna().unique().tolist())
+        all_duration = duration[~np.isnan(duration)]
+        self.all_duration_sum += all_duration.sum()
+        self.all_duration_count += len(all_duration)
+        self.all_rating_sum += rating[valid_rating].sum()
+        self.all_rating_count += int(valid_rating.sum())
+    
+    def summary(self):
+        """Aggregates of every row folded in so far, as served by ``month_summary``."""
+        rpu = self.rides_per_user if self.rides_per_user is not None else pd.Series(dtype=np.int64)
+        sid = rpu.index.get_level_values(0) if len(rpu) else np.array([], dtype=np.intp)
+        new_by_station = np.bincount([s for s, _ in self.new_users], minlength=len(STATIONS))
+        by_day = self.start_by_day is not None
+        days = self.start_by_day.shape[1] if by_day else 0
+        new_by_day = np.zeros((len(STATIONS), days + 1), dtype=np.int64)
+        for s, d, _ in self.new_users_by_day:
+            new_by_day[s, d] += 1
+        
+        def averages(sums, counts):
+            return [round(t / c, 2) if c else None for t, c in zip(sums.tolist(), counts.tolist())]
+        
+        stations, heatmaps, histograms, daily = {}, {}, {}, {}
+        for i, station in enumerate(STATIONS):
+            counts = rpu[sid == i]
+            total_riders = len(counts)
+            histograms[station] = ride_histogram(counts.to_numpy())
+            new_signups = int(new_by_station[i])
+            n_ratings = int(self.rating_count[i])
+            stations[station] = {
+                "total_starts": int(self.starts[i]),
+                "total_ends": int(self.ends[i]),
+                "started_ended": int(self.started_ended[i]),
+                "total_riders": total_riders,
+                "new_signups": new_signups,
+                "new_signup_pct": (new_signups / total_riders * 100) if total_riders else 0,
+                **segment_counts(histograms[station]),
+                "avg_duration": self.duration_sum[i] / self.duration_count[i] if self.duration_count[i] else np.nan,
+                "avg_rating": self.rating_sum[i] / n_ratings if n_ratings else None,
+                "positive_rating_pct": self.positive[i] / n_ratings * 100 if n_ratings else None,
+                "total_ratings": n_ratings,
+            }
+            heatmaps[station] = self.heat[i].copy() if self.starts[i] else None
+            if not by_day:
+                continue
+            daily[station] = {
+                "start_rides_by_day": self.start_by_day[i].tolist(),
+                "end_rides_by_day": self.end_by_day[i].tolist(),
+                "new_signups_by_day": new_by_day[i, 1:].tolist(),
+                "avg_duration_by_day": averages(self.duration_sum_by_day[i], self.duration_count_by_day[i]),
+                "avg_rating_by_day": averages(self.rating_sum_by_day[i], self.rating_count_by_day[i]),
+            }
+        
+        return {
+            "stations": stations,
+            "heatmaps": heatmaps,
+            "histograms": histograms,
+            "daily": daily,
+            "overall": {
+                "Total Rides": self.total_rides,
+                "Unique Users": len(self.users),
+                "Average Duration (min)": (
+                    self.all_duration_sum / self.all_duration_count if self.all_duration_count else np.nan
+                ),
+                "Total Duration (min)": self.all_duration_sum,
+                "Average Rating": self.all_rating_sum / self.all_rating_count if self.all_rating_count else None,
+            },
+        }
+
+@perf.timed()
+def month_summary(month):
+    """Aggregates for an uploaded month, served from disk when still fresh."""
+    fingerprint = month_file_fingerprint(month) if month else None
+    if fingerprint is None:
+        return None
+    return _month_summary(month, fingerprint, stations_hash())
+
+@memoized(max_entries=64)
+def _month_summary(month, fingerprint, config_hash):
+    summary = AGG_CACHE.get(month, "summary", fingerprint, config_hash)
+    # Summaries cached before the daily arrays or histograms existed are rebuilt once
+    if summary is not None and "daily" in summary and "histograms" in summary:
+        return apply_segments(summary)
+    aggregator = month_state(month)
+    if aggregator is None:
+        return None
+    return AGG_CACHE.put(month, "summary", fingerprint, config_hash, aggregator.summary())
+
+def store_month_aggregates(month, aggregator, fingerprint, config_hash):
+    """Cache an aggregator's state, rider sets and summary under the key of the rows it was built from."""
+    AGG_CACHE.put(month, "state", fingerprint, config_hash, aggregator.state())
+    AGG_CACHE.put(month, "users", fingerprint, config_hash, rider_sets(aggregator))
+    return AGG_CACHE.put(month, "summary", fingerprint, config_hash, aggregator.summary())
+
+def month_state(month):
+    """Resumable ``MonthAggregator`` for a stored month (built once from its rows)."""
+    # Keyed by the files and config current before the rows are read, never after
+    fingerprint, config_hash = month_file_fingerprint(month), stations_hash()
+    if fingerprint is None:
+        return None
+    state = AGG_CACHE.get(month, "state", fingerprint, config_hash)
+    if state is not None:
+        return MonthAggregator.from_state(state)
+    
+    if not month_validation(month)[0]:
+        return None
+    # Read without the in-memory cache: only the aggregates are kept
+    try:
+        df = read_month_rows(month)
+    except Exception:
+        return None
+    if df is None:
+        return None
+    aggregator = MonthAggregator(month)
+    aggregator.update(df)
+    store_month_aggregates(month, aggregator, fingerprint, config_hash)
+    return aggregator
+
+def _build_month_state(task):
+    """Worker process: build and store one month's aggregates; only a flag is sent back."""
+    global STATIONS
+    month, data_dir, stations = task
+    if BASE_DATA_DIR != data_dir:
+        configure(data_dir)
+    if STATIONS != stations:
+        STATIONS = dict(stations)
+        clear_caches()
+    return month_state(month) is not None
+
+@perf.timed()
+def prepare_month_states(months):
+    """Build the missing aggregates of several months in worker processes, ``MONTH_WORKERS`` at a time."""
+    config_hash = stations_hash()
+    missing = []
+    for m in months:
+        fingerprint = month_file_fingerprint(m)
+        if fingerprint is not None and not AGG_CACHE.has(m, "state", fingerprint, config_hash):
+            missing.append(m)
+    tasks = [(m, BASE_DATA_DIR, STATIONS) for m in missing]
+    for _ in month_pool.imap(_build_month_state, tasks, MONTH_WORKERS, processes=True):
+        pass
+    return missing
+
+# ===============================
+# RANGE AGGREGATES (QUARTER / YEAR / CUSTOM)
+# ===============================
+def span_months(first, last):
+    """Every month from ``first`` to ``last`` inclusive."""
+    return [str(p) for p in pd.period_range(first, last, freq="M")]
+
+def previous_span(first, last):
+    """The span of the same length that ends right before ``first``."""
+    n = len(span_months(first, last))
+    start = pd.Period(first, freq="M") - n
+    return str(start), str(start + n - 1)
+
+@perf.timed()
+def range_summary(months):
+    """Station metrics over several uploaded months, merged from their cached aggregates."""
+    uploaded = [(m, month_file_fingerprint(m)) for m in months]
+    uploaded = [(m, f) for m, f in uploaded if f is not None]
+    if not uploaded:
+        return None
+    months, fingerprints = zip(*uploaded)
+    return _range_summary(months, fingerprints, stations_hash())
+
+@memoized(max_entries=16)
+def _range_summary(months, fingerprints, config_hash):
+    prepare_month_states(months)
+    aggregators = [a for a in (month_state(m) for m in months) if a is not None]
+    if not aggregators:
+        return None
+    summary = MonthAggregator.merge(aggregators).summary()
+    summary["months"] = list(months)
+    return summary
+
+# ===============================
+# DISTINCT RIDERS (CROSS-MONTH)
+# ===============================
+def rider_sets(aggregator):
+    """Per-station sets of the month's riders (plus everyone under ``ALL_STATIONS``)."""
+    rpu = aggregator.rides_per_user
+    if rpu is None:
+        rpu = pd.Series(dtype=np.int64, index=pd.MultiIndex.from_arrays([[], []]))
+    sid = rpu.index.get_level_values(0).to_numpy()
+    users = rpu.index.get_level_values(1)
+    sets = {}
+    for i, station in enumerate(STATIONS):
+        sets[station] = user_sketch.UserSet.from_ids(users[sid == i])
+    sets[rollup.ALL_STATIONS] = user_sketch.UserSet.from_ids(list(aggregator.users))
+    return sets
+
+def month_riders(month):
+    """``{station: UserSet}`` of an uploaded month, None if it has no data."""
+    fingerprint = month_file_fingerprint(month)
+    if fingerprint is None:
+        return None
+    return _month_riders(month, fingerprint, stations_hash())
+
+@memoized(max_entries=64)
+def _month_riders(month, fingerprint, config_hash):
+    sets = AGG_CACHE.get(month, "users", fingerprint, config_hash)
+    if sets is not None:
+        return sets
+    aggregator = month_state(month)
+    if aggregator is None:
+        return None
+    return AGG_CACHE.put(month, "users", fingerprint, config_hash, rider_sets(aggregator))
+
+def riders_over(months, station=rollup.ALL_STATIONS):
+    """Distinct riders of a station over several months."""
+    sets = (month_riders(m) for m in months)
+    return user_sketch.union(s[station] for s in sets if s is not None)
+
+@perf.timed()
+def retention_table(months, station=rollup.ALL_STATIONS):
+    """Month-by-month riders, returning riders and first-time riders of a station."""
+    rows = []
+    seen = previous = None
+    for m in months:
+        sets = month_riders(m)
+        if sets is None:
+            continue
+        riders = sets[station]
+        returning = len(riders & previous) if previous is not None else None
+        rows.append({
+            "Month": m,
+            "Riders": len(riders),
+            "Returning": returning,
+            "Retention %": returning / len(previous) * 100 if previous is not None and len(previous) else None,
+            "First Seen": len(riders - seen) if seen is not None else len(riders),
+            "Distinct So Far": len(riders | seen) if seen is not None else len(riders),
+        })
+        seen = riders | seen if seen is not None else riders
+        previous = riders
+    table = pd.DataFrame(rows)
+    if not table.empty:
+        table["Returning"] = table["Returning"].astype("Int64")
+    return table
+
+@perf.timed()
+def station_overlap(months):
+    """Riders shared by each pair of stations over the months (diagonal: all riders)."""
+    names = list(STATIONS)
+    riders = {s: riders_over(months, s) for s in names}
+    shared = [[len(riders[a] & riders[b]) if a != b else len(riders[a]) for b in names] for a in names]
+    return pd.DataFrame(shared, index=pd.Index(names, name="Station"), columns=names)
+
+# ===============================
+# ROLLUP TABLE (CROSS-MONTH TRENDS)
+# ===============================
+def rollup_rows(summary):
+    """Rollup rows (one per station plus a month-wide row) from a month summary."""
+    config_hash = stations_hash()
+    rows = []
+    for station, data in summary["stations"].items():
+        avg_duration = data["avg_duration"]
+        rows.append({
+            "Metro Station": station,
+            "Rides Started": data["total_starts"],
+            "Rides Ended": data["total_ends"],
+            "Rides Started & Ended": data["started_ended"],
+            "Unique Users": data["total_riders"],
+            "New Users": data["new_signups"],
+            "Total Duration (min)": avg_duration * data["total_starts"] if pd.notna(avg_duration) else None,
+            "Avg Duration (min)": avg_duration,
+            "Heavy Users": data["heavy"],
+            "Heavy User Min Rides": HEAVY_USER_MIN,
+            "Avg Rating": data["avg_rating"],
+            "Stations Hash": config_hash,
+        })
+    
+    overall = summary["overall"]
+    rows.append({
+        "Metro Station": rollup.ALL_STATIONS,
+        "Rides Started": overall["Total Rides"],
+        "Unique Users": overall["Unique Users"],
+        "Total Duration (min)": overall.get("Total Duration (min)"),
+        "Avg Duration (min)": overall["Average Duration (min)"],
+        "Heavy User Min Rides": HEAVY_USER_MIN,
+        "Avg Rating": overall["Average Rating"],
+        "Stations Hash": config_hash,
+    })
+    return rows
+
+def update_rollup(month):
+    """Rewrite one month's rollup rows from its (cached) summary."""
+    summary = month_summary(month)
+    if summary is None:
+        rollup.drop_month(ROLLUP_FILE, month)
+    else:
+        rollup.replace_month(ROLLUP_FILE, month, rollup_rows(summary))
+
+@perf.timed()
+def load_rollup():
+    """Rollup rows for every uploaded month, filling in months missing or built under other settings."""
+    uploaded = get_uploaded_months()
+    config_hash = stations_hash()
+    
+    def current_rows(table):
+        return (table["Stations Hash"] == config_hash) & (table["Heavy User Min Rides"] == HEAVY_USER_MIN).fillna(False)
+    
+    table = rollup.read_rollup(ROLLUP_FILE)
+    current = set(table.loc[current_rows(table), "Month"])
+    missing = [m for m in uploaded if m not in current]
+    prepare_month_states(missing)
+    for m in missing:
+        update_rollup(m)
+    if missing:
+        table = rollup.read_rollup(ROLLUP_FILE)
+    return table[current_rows(table) & table["Month"].isin(uploaded)]
+
+# ===============================
+# INGESTION (CHUNKED)
+# ===============================
+INGEST_CHUNK_ROWS = 100_000
+# Only these columns are parsed and stored; anything else in an upload is skipped
+INGEST_COLUMNS = list(REQUIRED_COLUMNS) + [START_LAT_COL, START_LON_COL, END_LAT_COL, END_LON_COL]
+
+def read_upload_header(file, ext):
+    """Column names of an uploaded file, without reading its rows."""
+    if ext == "csv":
+        columns = [xlsx_reader.normalize_header(c) for c in pd.read_csv(file, nrows=0).columns]
+    else:
+        columns = xlsx_reader.read_header(file)
+    file.seek(0)
+    return pd.DataFrame(columns=columns)
+
+def iter_upload_chunks(file, ext, chunk_rows=INGEST_CHUNK_ROWS):
+    """Yield the ingested columns of an upload in chunks of ``chunk_rows``."""
+    if ext == "csv":
+        yield from pd.read_csv(
+            file,
+            dtype=str,
+            chunksize=chunk_rows,
+            usecols=lambda c: xlsx_reader.normalize_header(c) in INGEST_COLUMNS,
+        )
+    else:
+        for chunk in xlsx_reader.iter_chunks(file, INGEST_COLUMNS, chunk_rows):
+            # Cells keep their workbook types; station names are stored as text
+            for col in (START_COL, END_COL):
+                if col in chunk.columns:
+                    chunk[col] = chunk[col].astype(str).where(chunk[col].notna())
+            yield chunk
+
+@perf.timed()
+def ingest_upload(file, ext, month, chunk_rows=INGEST_CHUNK_ROWS, append=False):
+    """Validate, clean and store an upload chunk by chunk; returns ``(is_valid, error_msg, rows)``."""
+    is_valid, _, error_msg = validate_dataframe(read_upload_header(file, ext))
+    if not is_valid:
+        return False, error_msg, 0
+    
+    stored = CATALOG.entry(month)
+    stored_ext = stored["format"] if stored else None
+    if stored_ext is None:
+        append = False
+    elif append and stored_ext != month_store.STORE_EXT:
+        return False, f"{month} is not in the Parquet store yet; replace it instead of appending", 0
+    
+    config_hash = stations_hash()
+    aggregator = month_state(month) if append else MonthAggregator(month)
+    if aggregator is None:
+        return False, f"Stored data for {month} is invalid; replace it instead of appending", 0
+    
+    with month_store.MonthWriter(BASE_DATA_DIR, month, append=append) as writer:
+        for chunk in iter_upload_chunks(file, ext, chunk_rows):
+            chunk = add_station_ids(assign_points(clean_df(chunk)))
+            writer.append(chunk)
+            aggregator.update(chunk)
+    
+    entry = CATALOG.index_month(month)
+    if not append:
+        AGG_CACHE.invalidate_month(month)
+    store_month_aggregates(month, aggregator, entry["hash"], config_hash)
+    update_rollup(month)
+    return True, "", writer.rows
+
+# ===============================
+# EXPORT FUNCTIONS
+# ===============================
+def export_to_csv(df, filename):
+    """Convert DataFrame to CSV for download."""
+    return df.to_csv(index=False).encode('utf-8')
+
+
+def _excel_serial_date(dt):
+    """Convert datetime to Excel serial date (days since 1899-12-30)."""
+    if pd.isna(dt):
+        return None
+    if hasattr(dt, "to_pydatetime"):
+        dt = dt.to_pydatetime()
+    return (dt.replace(tzinfo=None) - datetime(1899, 12, 30)).days
+
+
+def _compute_overall_trend():
+    """Compute monthly trend of key metrics across all stations."""
+    rows = rollup.station_rows(load_rollup(), rollup.ALL_STATIONS)
+    return pd.DataFrame({
+        "Month": rows["Month"],
+        "Total Rides": rows["Rides Started"],
+        "Unique Users": rows["Unique Users"],
+        "Average Duration (min)": rows["Avg Duration (min)"],
+        "Average Rating": rows["Avg Rating"],
+    })
+
+
+def _compute_station_trend(station_name):
+    """Compute monthly trend of metrics for a single station across all months."""
+    keyword = STATIONS.get(station_name)
+    if not keyword:
+        return pd.DataFrame()
+
+    rows = rollup.station_rows(load_rollup(), station_name)
+    return pd.DataFrame({
+        "Month": rows["Month"],
+        "Total Starts": rows["Rides Started"],
+        "Total Riders": rows["Unique Users"],
+        "Heavy Users": rows["Heavy Users"],
+        "Avg Duration": rows["Avg Duration (min)"],
+        "Avg Rating": rows["Avg Rating"],
+    })
+
+
+def _build_export_plan(summary, stations_to_export):
+    """Gather every per-station input of the report from the month summary."""
+    plan = {}
+    for station_name in stations_to_export:
+        heat = summary["heatmaps"].get(station_name)
+        if heat is None:
+            continue
+        counts = np.asarray(heat, dtype=np.int64)
+        plan[station_name] = {
+            "station_data": summary["stations"][station_name],
+            "daily": summary["daily"][station_name],
+            "ride_distribution": ride_distribution(summary["histograms"][station_name]),
+            "heat": counts,
+            "day_totals": counts.sum(axis=1),
+            "hourly_totals": counts.sum(axis=0),
+            "trend": compute_monthly_trend(station_name),
+        }
+    return plan
+
+
+@perf.timed()
+def export_month_to_excel(summary, month):
+    """Build Excel report for the selected month only: same KPIs/metrics/layout for copy-paste into a bigger workbook."""
+    output = io.BytesIO()
+    year, month_num = int(month.split("-")[0]), int(month.split("-")[1])
+    first_day = datetime(year, month_num, 1)
+    last_day_dt = pd.Timestamp(year=year, month=month_num, day=1) + pd.offsets.MonthEnd(0)
+    num_days = last_day_dt.day
+    serial_start = _excel_serial_date(first_day)
+    serial_end = _excel_serial_date(last_day_dt)
+
+    # Template sheet order (match "Metro GL3 (November - 2025).xlsx"); then any other stations
+    station_order = [
+        "Safaa Hegazy",
+        "Heliopolis",
+        "Al-Ahram",
+        "Koleyet El Banat",
+        "Alf Maskan",
+        "Haroun",
+    ]
+    ordered = [s for s in station_order if s in STATIONS]
+    rest = [s for s in STATIONS.keys() if s not in station_order]
+    stations_to_export = ordered + rest
+    plan = _build_export_plan(summary, stations_to_export)
+
+    with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
+        workbook = writer.book
+        header_fmt = workbook.add_format(
+            {"bold": True, "bg_color": "#065f46", "font_color": "#FFFFFF", "border": 1, "align": "center"}
+        )
+        label_fmt = workbook.add_format({"bold": True, "border": 1, "align": "left"})
+        cell_fmt = workbook.add_format({"border": 1, "align": "center"})
+        pct_fmt = workbook.add_format({"border": 1, "align": "center", "num_format": "0.0%"})
+        date_fmt = workbook.add_format(
+            {"border": 1, "align": "center", "num_format": "dd/mm/yyyy"}
+        )
+
+        for station_name, bundle in plan.items():
+            daily = bundle["daily"]
+            sd = bundle["station_data"]
+            sheet_name = station_name[:31]
+            ws = workbook.add_worksheet(sheet_name)
+            ws.freeze_panes(1, 1)
+
+            # Monthly aggregates (one column = selected month)
+            total_start_rides = sd["total_starts"]
+            total_end_rides = sd["total_ends"]
+            avg_dur = sd.get("avg_duration")
+            total_duration = (avg_dur * total_start_rides) if (avg_dur is not None and total_start_rides) else None
+            new_signups_total = sum(daily["new_signups_by_day"])
+            total_riders = sd["one_time"] + sd["light"] + sd["heavy"]
+            started_ended = sd["started_ended"]
+            started_ended_pct = (started_ended / total_start_rides * 100) if total_start_rides else 0
+            new_signup_pct_over_riders = (new_signups_total / total_riders * 100) if total_riders else 0
+
+            # Row 1: station name, month start date, month end date
+            ws.write(0, 0, station_name, label_fmt)
+            ws.write(0, 1, serial_start, date_fmt)
+            ws.write(0, 2, serial_end, date_fmt)
+
+            # Section 1: Ride metrics — one column (month total)
+            ws.write(2, 0, "Day / Period", label_fmt)
+            ws.write(2, 1, serial_start, date_fmt)
+            ws.write(3, 0, "Start Rides", label_fmt)
+            ws.write(3, 1, total_start_rides, cell_fmt)
+            ws.write(4, 0, "End Rides", label_fmt)
+            ws.write(4, 1, total_end_rides, cell_fmt)
+            ws.write(5, 0, "Total", label_fmt)
+            ws.write(5, 1, round(total_duration, 2) if total_duration is not None else "", cell_fmt)
+            ws.write(6, 0, "AVG Ride Duration", label_fmt)
+            ws.write(6, 1, sd["avg_duration"] if sd.get("avg_duration") is not None else "", cell_fmt)
+            ws.write(7, 0, "Rating (After Trip)", label_fmt)
+            ws.write(7, 1, sd["avg_rating"] if sd.get("avg_rating") is not None else "", cell_fmt)
+
+            # Right after first table: rides that start & end at station + % of start rides
+            ws.write(8, 0, f"#of Rides Start & Ended {station_name}", label_fmt)
+            ws.write(8, 1, started_ended, cell_fmt)
+            ws.write(9, 0, "% of Start Rides", label_fmt)
+            ws.write(9, 1, started_ended_pct / 100.0, pct_fmt)
+
+            # Third table: total riders, new signups, new signups over total riders
+            ws.write(11, 0, "Day / Period", label_fmt)
+            ws.write(11, 1, serial_start, date_fmt)
+            ws.write(12, 0, "Number Of Users", label_fmt)
+            ws.write(12, 1, total_riders, cell_fmt)
+            ws.write(13, 0, "New-Signup", label_fmt)
+            ws.write(13, 1, new_signups_total, cell_fmt)
+            ws.write(14, 0, "New Signup % (over total riders)", label_fmt)
+            ws.write(14, 1, new_signup_pct_over_riders / 100.0, pct_fmt)
+
+            # Block 4: 1-Time User distribution (unchanged — already monthly)
+            dist = bundle["ride_distribution"]
+            shown = dist.sort_index().iloc[:31]
+            ride_counts = shown.index.to_numpy(dtype=np.int64)
+            users = shown.to_numpy(dtype=np.int64)
+            total_dist = dist.sum()
+            ws.write(21, 0, "1-Time User", label_fmt)
+            ws.write_row(21, 1, ride_counts.tolist(), cell_fmt)
+            ws.write(22, 0, "Number Of Users", label_fmt)
+            ws.write_row(22, 1, users.tolist(), cell_fmt)
+            ws.write(23, 0, "--", label_fmt)
+            shares = users / total_dist if total_dist else np.zeros(len(users))
+            ws.write_row(23, 1, shares.tolist(), pct_fmt)
+
+            # Summary: 1-Time, Light-user, Heavy-user — Rows 27–30
+            ws.write(26, 0, "1-Time", label_fmt)
+            ws.write(26, 1, sd["one_time"], cell_fmt)
+            ws.write(26, 2, (sd["one_time"] / total_riders) if total_riders else 0, pct_fmt)
+            ws.write(27, 0, "Light-user", label_fmt)
+            ws.write(27, 1, sd["light"], cell_fmt)
+            ws.write(27, 2, (sd["light"] / total_riders) if total_riders else 0, pct_fmt)
+            ws.write(28, 0, "Heavy-user", label_fmt)
+            ws.write(28, 1, sd["heavy"], cell_fmt)
+            ws.write(28, 2, (sd["heavy"] / total_riders) if total_riders else 0, pct_fmt)
+            ws.write(29, 1, total_riders, cell_fmt)
+
+            ws.set_column(0, 0, 24)
+            ws.set_column(1, 1, 12)
+
+        # Hourly Patterns sheet — match original: station/month header, heatmap + Total row, conditional format, two line charts
+        hp_ws = workbook.add_worksheet("Hourly Patterns")
+        hp_ws.freeze_panes(1, 1)
+        month_label = pd.Timestamp(f"{month}-01").strftime("%B - %Y")
+        day_names = ["Sunday", "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"]
+        block_height = 40
+        row_offset = 0
+        for station_name, bundle in plan.items():
+            heat = bundle["heat"]
+            if heat is None:
+                continue
+            r0 = row_offset
+            hp_ws.write(r0, 0, f"{station_name} / {month_label}", label_fmt)
+            r0 += 1
+            hp_ws.write(r0, 0, "Day", header_fmt)
+            hp_ws.write_row(r0, 1, list(range(24)), header_fmt)
+            hp_ws.write(r0, 25, "Total", header_fmt)
+            r0 += 1
+            for day_name, day_counts, day_total in zip(day_names, heat.tolist(), bundle["day_totals"].tolist()):
+                hp_ws.write(r0, 0, day_name, label_fmt)
+                hp_ws.write_row(r0, 1, day_counts, cell_fmt)
+                hp_ws.write(r0, 25, day_total, cell_fmt)
+                r0 += 1
+            hourly_totals = bundle["hourly_totals"].tolist()
+            hp_ws.write(r0, 0, "Total", label_fmt)
+            hp_ws.write_row(r0, 1, hourly_totals, cell_fmt)
+            hp_ws.write(r0, 25, sum(hourly_totals), cell_fmt)
+            hp_ws.conditional_format(
+                row_offset + 2, 1, r0, 25,
+                {"type": "3_color_scale", "min_color": "#F8696B", "mid_color": "#FFEB84", "max_color": "#63BE7B"}
+            )
+            r0 += 1
+            data_row = r0 + 1
+            hp_ws.write(r0, 27, "Hour", label_fmt)
+            hp_ws.write(r0, 28, "Rides", label_fmt)
+            hp_ws.write_column(data_row, 27, list(range(24)), cell_fmt)
+            hp_ws.write_column(data_row, 28, hourly_totals, cell_fmt)
+            chart_hourly = workbook.add_chart({"type": "line"})
+            chart_hourly.add_series({
+                "categories": ["Hourly Patterns", data_row, 27, data_row + 23, 27],
+                "values": ["Hourly Patterns", data_row, 28, data_row + 23, 28],
+                "name": "Hourly trend",
+                "data_labels": {"value": True},
+            })
+            chart_hourly.set_title({"name": "Hourly trend"})
+            chart_hourly.set_x_axis({"name": "Hour"})
+            chart_hourly.set_y_axis({"name": "Rides"})
+            chart_hourly.set_size({"width": 480, "height": 240})
+            hp_ws.insert_chart(r0 + 1, 0, chart_hourly)
+            trend_df = bundle["trend"]
+            hp_ws.write(r0, 30, "Month", label_fmt)
+            hp_ws.write(r0, 31, "Start Rides", label_fmt)
+            if not trend_df.empty:
+                hp_ws.write_column(data_row, 30, trend_df["Month"].tolist(), cell_fmt)
+                hp_ws.write_column(data_row, 31, trend_df["Start Rides"].tolist(), cell_fmt)
+            n_trend = len(trend_df)
+            if n_trend > 0:
+                chart_monthly = workbook.add_chart({"type": "line"})
+                chart_monthly.add_series({
+                    "categories": ["Hourly Patterns", data_row, 30, data_row + n_trend - 1, 30],
+                    "values": ["Hourly Patterns", data_row, 31, data_row + n_trend - 1, 31],
+                    "name": "Monthly trend",
+                    "data_labels": {"value": True},
+                })
+                chart_monthly.set_title({"name": "Monthly trend"})
+                chart_monthly.set_x_axis({"name": "Month"})
+                chart_monthly.set_y_axis({"name": "Start Rides"})
+                chart_monthly.set_size({"width": 400, "height": 240})
+                hp_ws.insert_chart(r0 + 1, 10, chart_monthly)
+            row_offset += block_height
+
+    output.seek(0)
+    return output.getvalue()
+
+
+# ===============================
+# BACKGROUND PRECOMPUTE
+# ===============================
+def report_hash():
+    """Cache key part of the month reports: their trend covers every uploaded month."""
+    parts = [stations_hash(), f"{LIGHT_USER_MIN}-{LIGHT_USER_MAX}-{HEAVY_USER_MIN}"]
+    parts += [f"{m}:{month_file_fingerprint(m)}" for m in get_uploaded_months()]
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()[:16]
+
+def month_report(month):
+    """The month's stored report workbook, None until it has been built."""
+    fingerprint = month_file_fingerprint(month)
+    if fingerprint is None:
+        return None
+    return AGG_CACHE.get(month, "report", fingerprint, report_hash())
+
+@perf.timed()
+def build_month_report(month):
+    """Build a month's report workbook from its stored summary and store it with the aggregates."""
+    fingerprint, key = month_file_fingerprint(month), report_hash()
+    summary = month_summary(month)
+    if summary is None:
+        return None
+    return AGG_CACHE.put(month, "report", fingerprint, key, export_month_to_excel(summary, month))
+
+def precompute_month(month, progress):
+    """Job: build every artefact the views serve for a month (aggregates, rollup row, report)."""
+    progress(0, 3, "aggregates")
+    if month_state(month) is None:
+        raise ValueError(f"{month} has no valid stored data")
+    progress(1, 3, "rollup")
+    update_rollup(month)
+    progress(2, 3, "report")
+    build_month_report(month)
@@ -1,17 +1,8 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-from math import radians, sin, cos, sqrt, atan2
-
-# ------------------- HELPER FUNCTION -------------------
-def haversine(lat1, lon1, lat2, lon2):
-    """Great-circle distance (meters) between two coordinates."""
-    R = 6371000
-    phi1, phi2 = radians(lat1), radians(lat2)
-    dphi = radians(lat2 - lat1)
-    dlambda = radians(lon2 - lon1)
-    a = sin(dphi/2)**2 + cos(phi1)*cos(phi2)*sin(dlambda/2)**2
-    return R * 2 * atan2(sqrt(a), sqrt(1 - a))
+import numpy as np
+from station_index import PointIndex, load_point_index
+import xlsx_reader
 
 # ------------------- METRO COORDINATES -------------------
 metro_stations = {
@@ -22,6 +13,11 @@ metro_stations = {
     "Haroun": (30.0853, 31.3271),
 }
 DISTANCE_THRESHOLD = 1000  # meters (1 km)
+POINT_RADIUS = 150  # meters — docking points in metro_points.csv are dense
+
+@st.cache_resource
+def get_station_index():
+    return PointIndex.from_dict(metro_stations, DISTANCE_THRESHOLD)
 
 # ------------------- STREAMLIT SETUP -------------------
 st.set_page_config(page_title="Masr El Gdeida Metro Dashboard", layout="wide")
@@ -30,11 +26,13 @@ st.title("🚲 Masr El Gdeida — Metro Station Ride Performance Dashboard")
 uploaded_file = st.file_uploader("Upload your monthly dataset (CSV or Excel)", type=["csv", "xlsx"])
 
 if uploaded_file:
+    import plotly.express as px   # only needed once there is data to chart
+
     # ---------- Load ----------
     if uploaded_file.name.endswith(".csv"):
         df = pd.read_csv(uploaded_file)
     else:
-        df = pd.read_excel(uploaded_file)
+        df = xlsx_reader.read_xlsx(uploaded_file)
 
     # ---------- Clean ----------
     df["Start Date Local"] = pd.to_datetime(df["Start Date Local"], errors="coerce")
@@ -43,19 +41,19 @@ if uploaded_file:
         df[col] = pd.to_numeric(df[col], errors="coerce")
 
     # ---------- Assign nearest metro ----------
-    def find_nearest_station(lat, lon):
-        if pd.isna(lat) or pd.isna(lon):
-            return None
-        nearest_station, nearest_distance = None, float("inf")
-        for name, (m_lat, m_lon) in metro_stations.items():
-            dist = haversine(lat, lon, m_lat, m_lon)
-            if dist < nearest_distance:
-                nearest_station, nearest_distance = name, dist
-        return nearest_station if nearest_distance <= DISTANCE_THRESHOLD else None
-
     st.info("Assigning rides to nearest metro station (≤ 1 km)… ⏳")
-    df["Start Station"] = df.apply(lambda x: find_nearest_station(x["Start Lat"], x["Start Long"]), axis=1)
-    df["End Station"]   = df.apply(lambda x: find_nearest_station(x["Stop Lat"],  x["Stop Long"]),  axis=1)
+    # Start and Stop coordinates go through the distance engine in one pass
+    n = len(df)
+    lats = np.concatenate([df["Start Lat"].to_numpy(float), df["Stop Lat"].to_numpy(float)])
+    lons = np.concatenate([df["Start Long"].to_numpy(float), df["Stop Long"].to_numpy(float)])
+    nearest = get_station_index().nearest_names(lats, lons)
+    df["Start Station"] = nearest[:n]
+    df["End Station"]   = nearest[n:]
+
+    # Same pass against the docking points in metro_points.csv
+    points = load_point_index(radius=POINT_RADIUS).nearest_names(lats, lons)
+    df["Start Point"] = points[:n]
+    df["End Point"]   = points[n:]
 
     # ---------- Remove non-metro rides completely ----------
     metro_names = list(metro_stations.keys())
@@ -164,6 +162,19 @@ if uploaded_file:
                          markers=True, title="Weekend Hourly Ride Trends")
         st.plotly_chart(fig_we, use_container_width=True)
 
+    # ------------------- DOCKING POINTS -------------------
+    st.subheader("📍 Docking Point Breakdown")
+    point_summary = (
+        pd.concat([
+            df.groupby("Start Point").size().rename("Rides Started"),
+            df.groupby("End Point").size().rename("Rides Ended"),
+        ], axis=1)
+        .fillna(0).astype(int)
+        .sort_values("Rides Started", ascending=False)
+    )
+    point_summary.index.name = "Docking Point"
+    st.dataframe(point_summary, use_container_width=True)
+
     # ------------------- MAP -------------------
     fig_map = px.scatter_mapbox(
         df[df["Start Station"].isin(metro_names)],
@@ -0,0 +1,27 @@
+"""Bounded concurrent work over several months."""
+import itertools
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+DEFAULT_WORKERS = max(1, min(4, os.cpu_count() or 1))
+
+
+def imap(func, items, workers=DEFAULT_WORKERS, processes=False):
+    """Yield ``(item, func(item))`` as each finishes, with at most ``workers`` running."""
+    items = list(items)
+    if workers <= 1 or len(items) <= 1:
+        for item in items:
+            yield item, func(item)
+        return
+
+    executor = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    queue = iter(items)
+    with executor(max_workers=min(workers, len(items))) as pool:
+        pending = {pool.submit(func, item): item for item in itertools.islice(queue, workers)}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = pending.pop(future)
+                for following in itertools.islice(queue, 1):
+                    pending[pool.submit(func, following)] = following
+                yield item, future.result()
@@ -0,0 +1,270 @@
+"""Columnar (Parquet) storage for the monthly ride data under data/<year>/."""
+import os
+
+import pandas as pd
+
+import month_pool
+import xlsx_reader
+from atomic_file import atomic_write
+
+STORE_EXT = "parquet"
+LEGACY_EXTS = ("csv", "xlsx")
+
+
+def month_path(base_dir, month, ext=STORE_EXT):
+    """Path of a month file, e.g. data/2025/2025-11.parquet."""
+    return os.path.join(base_dir, month.split("-")[0], f"{month}.{ext}")
+
+
+def delta_paths(base_dir, month):
+    """Appended delta files of a month, oldest first."""
+    folder = os.path.dirname(month_path(base_dir, month))
+    prefix, suffix = f"{month}.d", f".{STORE_EXT}"
+    if not os.path.isdir(folder):
+        return []
+    names = sorted(n for n in os.listdir(folder) if n.startswith(prefix) and n.endswith(suffix))
+    return [os.path.join(folder, n) for n in names]
+
+
+def month_files(base_dir, month):
+    """Every file holding rows of the month (month file first), [] if absent."""
+    path, ext = find_month_file(base_dir, month)
+    if path is None:
+        return []
+    return [path] + (delta_paths(base_dir, month) if ext == STORE_EXT else [])
+
+
+def find_month_file(base_dir, month):
+    """Return ``(path, ext)`` of the stored month, Parquet first, else ``(None, None)``."""
+    for ext in (STORE_EXT,) + LEGACY_EXTS:
+        path = month_path(base_dir, month, ext)
+        if os.path.exists(path):
+            return path, ext
+    return None, None
+
+
+def list_months(base_dir, years):
+    """``{month: ext}`` of every stored month in ``years``, one directory listing per year."""
+    found = {}
+    for year in years:
+        folder = os.path.join(base_dir, str(year))
+        if not os.path.isdir(folder):
+            continue
+        for name in os.listdir(folder):
+            month, _, ext = name.partition(".")
+            if ext in (STORE_EXT,) + LEGACY_EXTS and len(month) == 7 and month.startswith(f"{year}-"):
+                # Parquet wins over a leftover legacy file, as in find_month_file
+                if found.get(month) != STORE_EXT:
+                    found[month] = ext
+    return found
+
+
+def read_legacy(path):
+    """Read a raw CSV/XLSX month file as-is (no cleaning)."""
+    if path.endswith(".csv"):
+        return pd.read_csv(path)
+    return xlsx_reader.read_xlsx(path)
+
+
+def _read_legacy_or_none(path):
+    # Module level so worker processes can run it
+    try:
+        return read_legacy(path)
+    except Exception:
+        return None
+
+
+def _arrow_safe(df):
+    """Stringify object columns holding mixed types so Arrow can store them."""
+    out = df
+    for col in df.columns:
+        if df[col].dtype != object:
+            continue
+        values = df[col].dropna()
+        if values.map(type).nunique() > 1:
+            if out is df:
+                out = df.copy()
+            out[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return out
+
+
+def _publish(base_dir, month, tmp):
+    """Move a finished temp file into place and drop legacy/delta files for the month."""
+    path = month_path(base_dir, month)
+    os.replace(tmp, path)
+    _drop_superseded(base_dir, month)
+    return path
+
+
+def _drop_superseded(base_dir, month):
+    """Remove legacy and delta files replaced by a freshly written month file."""
+    for ext in LEGACY_EXTS:
+        legacy = month_path(base_dir, month, ext)
+        if os.path.exists(legacy):
+            os.remove(legacy)
+    for delta in delta_paths(base_dir, month):
+        os.remove(delta)
+
+
+def _conform(table, schema):
+    """Select/cast an Arrow table to ``schema``; missing columns become nulls."""
+    import pyarrow as pa
+
+    columns = [
+        table.column(f.name) if f.name in table.column_names else pa.nulls(len(table), f.type)
+        for f in schema
+    ]
+    return pa.Table.from_arrays(columns, names=schema.names).cast(schema)
+
+
+def write_month(base_dir, month, df):
+    """Store a cleaned month as Parquet, replacing any older file for it."""
+    path = atomic_write(month_path(base_dir, month), lambda tmp: _arrow_safe(df).to_parquet(tmp, index=False))
+    _drop_superseded(base_dir, month)
+    return path
+
+
+class MonthWriter:
+    """Append cleaned chunks of one month to Parquet (or to a delta file with ``append=True``)."""
+
+    def __init__(self, base_dir, month, append=False):
+        self.base_dir = base_dir
+        self.month = month
+        self.append_only = append
+        self.rows = 0
+        self._writer = None
+        self._schema = None
+        if append:
+            import pyarrow.parquet as pq
+
+            main = month_path(base_dir, month)
+            self._schema = pq.read_schema(main)
+            self.path = f"{main[:-len(STORE_EXT) - 1]}.d{len(delta_paths(base_dir, month)) + 1:04d}.{STORE_EXT}"
+        else:
+            self.path = month_path(base_dir, month)
+        self._tmp = f"{self.path}.tmp"
+
+    def append(self, df):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pandas(_arrow_safe(df), preserve_index=False)
+        if self._schema is None:
+            self._schema = table.schema
+        else:
+            table = _conform(table, self._schema)
+        if self._writer is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._writer = pq.ParquetWriter(self._tmp, self._schema)
+        self._writer.write_table(table)
+        self.rows += len(df)
+
+    def close(self):
+        """Finish the file and publish it as the month's data."""
+        if self._writer is None:
+            raise ValueError(f"No rows written for {self.month}")
+        self._writer.close()
+        self._writer = None
+        if self.append_only:
+            os.replace(self._tmp, self.path)
+            return self.path
+        return _publish(self.base_dir, self.month, self._tmp)
+
+    def abort(self):
+        """Discard everything written so far; the stored month is untouched."""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if os.path.exists(self._tmp):
+            os.remove(self._tmp)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+def _concat_parts(frames):
+    """Concatenate month/delta frames, keeping categorical columns categorical."""
+    from pandas.api.types import union_categoricals
+
+    if len(frames) == 1:
+        return frames[0]
+    attrs = frames[0].attrs if all(f.attrs == frames[0].attrs for f in frames) else {}
+    for col in frames[0].columns:
+        if isinstance(frames[0][col].dtype, pd.CategoricalDtype):
+            # An all-null delta column reads back with empty object categories
+            categories = frames[0][col].cat.categories.dtype
+            parts = [
+                f[col] if f[col].cat.categories.dtype == categories
+                else f[col].cat.rename_categories(f[col].cat.categories.astype(categories))
+                for f in frames
+            ]
+            merged = union_categoricals(parts, ignore_order=True)
+            frames = [f.assign(**{col: pd.Categorical(p, categories=merged.categories)}) for f, p in zip(frames, parts)]
+    out = pd.concat(frames, ignore_index=True)
+    out.attrs = dict(attrs)
+    return out
+
+
+def read_month(base_dir, month, columns=None):
+    """Read a stored Parquet month with its deltas, optionally only ``columns``; None if absent."""
+    path = month_path(base_dir, month)
+    if not os.path.exists(path):
+        return None
+    if columns is not None:
+        import pyarrow.parquet as pq
+
+        available = set(pq.read_schema(path).names)
+        columns = [c for c in columns if c in available]
+    paths = [path] + delta_paths(base_dir, month)
+    return _concat_parts([pd.read_parquet(p, columns=columns) for p in paths])
+
+
+def delete_month(base_dir, month):
+    """Remove every stored file (Parquet, deltas or legacy) for a month."""
+    for path in delta_paths(base_dir, month):
+        os.remove(path)
+    for ext in (STORE_EXT,) + LEGACY_EXTS:
+        path = month_path(base_dir, month, ext)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def migrate_month(base_dir, month, clean, validate=None):
+    """Convert one legacy CSV/XLSX month to Parquet; True when it was converted."""
+    path, ext = find_month_file(base_dir, month)
+    if path is None or ext == STORE_EXT:
+        return False
+    df = read_legacy(path)
+    if validate is not None and not validate(df)[0]:
+        return False
+    write_month(base_dir, month, clean(df))
+    return True
+
+
+def migrate_all(base_dir, months, clean, validate=None, workers=1):
+    """One-shot migration of every legacy month in ``months``; returns converted months."""
+    legacy = {}
+    for month in months:
+        path, ext = find_month_file(base_dir, month)
+        if path is not None and ext != STORE_EXT:
+            legacy[path] = month
+    
+    converted = []
+    for path, df in month_pool.imap(_read_legacy_or_none, legacy, workers, processes=True):
+        month = legacy[path]
+        try:
+            # Leave unreadable or invalid files where they are; the dashboard reports them
+            if df is None or (validate is not None and not validate(df)[0]):
+                continue
+            write_month(base_dir, month, clean(df))
+            converted.append(month)
+        except Exception:
+            continue
+    return sorted(converted)
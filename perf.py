@@ -0,0 +1,166 @@
+"""Optional per-run instrumentation for the dashboard."""
+import functools
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_local = threading.local()
+
+
+def frame_info(obj):
+    """``(rows, columns, bytes)`` of a DataFrame/Series, None for anything else."""
+    if not (hasattr(obj, "shape") and hasattr(obj, "memory_usage")):
+        return None
+    usage = obj.memory_usage(deep=True)
+    size = int(usage.sum()) if hasattr(usage, "sum") else int(usage)
+    columns = obj.shape[1] if len(obj.shape) > 1 else 1
+    return obj.shape[0], columns, size
+
+
+def peak_rss_mb():
+    """Peak resident memory of the process so far, None where unavailable."""
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024   # KiB on Linux
+
+
+class Run:
+    """Stage timings and cache counters of one script run."""
+
+    def __init__(self):
+        self.started = datetime.now().isoformat(timespec="seconds")
+        self.stages = []
+        self.caches = {}
+        self._depth = 0
+        self._misses = {}
+
+    def cache_stats(self, name):
+        return self.caches.setdefault(name, {"hits": 0, "misses": 0})
+
+    def stage_rows(self):
+        """Stages in start order; nested stages are indented under their parent."""
+        return [
+            {
+                "Stage": "· " * s["depth"] + s["name"],
+                "Seconds": round(s["seconds"], 4),
+                "Cache": s.get("cache"),
+                "Rows": s.get("rows"),
+                "Columns": s.get("columns"),
+                "MB": round(s["bytes"] / 2**20, 2) if s.get("bytes") is not None else None,
+            }
+            for s in self.stages
+        ]
+
+    def to_record(self):
+        return {
+            "started": self.started,
+            "stages": self.stages,
+            "caches": self.caches,
+            "peak_rss_mb": peak_rss_mb(),
+        }
+
+
+class _Stage:
+    """Handle yielded by ``stage``; ``frame(df)`` attaches a result's size."""
+
+    def __init__(self, entry):
+        self.entry = entry
+
+    def frame(self, obj):
+        if self.entry is None:
+            return obj
+        info = frame_info(obj)
+        if info is not None:
+            self.entry["rows"], self.entry["columns"], self.entry["bytes"] = info
+        return obj
+
+
+def start_run(enabled=True):
+    """Begin recording for the current thread (or stop recording when disabled)."""
+    _local.run = Run() if enabled else None
+    return _local.run
+
+
+def current_run():
+    """The run being recorded on this thread, None when instrumentation is off."""
+    return getattr(_local, "run", None)
+
+
+@contextmanager
+def stage(name):
+    """Time a block as a named stage of the current run."""
+    run = current_run()
+    if run is None:
+        yield _Stage(None)
+        return
+    entry = {"name": name, "depth": run._depth}
+    run.stages.append(entry)
+    run._depth += 1
+    start = time.perf_counter()
+    try:
+        yield _Stage(entry)
+    finally:
+        entry["seconds"] = time.perf_counter() - start
+        run._depth -= 1
+
+
+def timed(name=None):
+    """Decorator recording every call as a stage, with the size of a returned frame."""
+    def decorate(func):
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(label) as s:
+                return s.frame(func(*args, **kwargs))
+        return wrapper
+    return decorate
+
+
+def cached(cache, name=None):
+    """Apply a cache decorator (e.g. ``st.cache_data(...)``) and count its hits and misses."""
+    def decorate(func):
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def body(*args, **kwargs):
+            run = current_run()
+            if run is not None:
+                run._misses[label] = run._misses.get(label, 0) + 1
+            return func(*args, **kwargs)
+
+        cached_func = cache(body)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            run = current_run()
+            if run is None:
+                return cached_func(*args, **kwargs)
+            misses = run._misses.get(label, 0)
+            with stage(label) as s:
+                result = s.frame(cached_func(*args, **kwargs))
+            stats = run.cache_stats(label)
+            if run._misses.get(label, 0) > misses:
+                stats["misses"] += 1
+                s.entry["cache"] = "miss"
+            else:
+                stats["hits"] += 1
+                s.entry["cache"] = "hit"
+            return result
+
+        wrapper.clear = cached_func.clear
+        return wrapper
+    return decorate
+
+
+def append_jsonl(path, run):
+    """Append one run as a JSON line (for offline analysis)."""
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(run.to_record(), default=str) + "\n")
@@ -0,0 +1,81 @@
+"""Per-month, per-station rollup table backing the cross-month trend views."""
+import os
+import threading
+from functools import lru_cache
+
+import pandas as pd
+
+from atomic_file import atomic_write
+
+ALL_STATIONS = "All Stations"
+ROLLUP_COLUMNS = [
+    "Metro Station",
+    "Rides Started",
+    "Rides Ended",
+    "Rides Started & Ended",
+    "Unique Users",
+    "New Users",
+    "Total Duration (min)",
+    "Avg Duration (min)",
+    "Heavy Users",
+    "Heavy User Min Rides",
+    "Avg Rating",
+    "Month",
+    "Stations Hash",
+]
+COUNT_COLUMNS = [
+    "Rides Started",
+    "Rides Ended",
+    "Rides Started & Ended",
+    "Unique Users",
+    "New Users",
+    "Heavy Users",
+    "Heavy User Min Rides",
+]
+
+# The job thread and script threads update the table at the same time
+_lock = threading.Lock()
+
+
+@lru_cache(maxsize=4)
+def _read(path, mtime):
+    # Counts are nullable: the month-wide row has no per-station counts
+    dtypes = {"Month": str, "Stations Hash": str, **{c: "Int64" for c in COUNT_COLUMNS}}
+    # Tables written before a column existed get it empty, which marks their rows stale
+    return pd.read_csv(path, dtype=dtypes).reindex(columns=ROLLUP_COLUMNS)
+
+
+def read_rollup(path):
+    """The whole rollup table (empty frame if it does not exist yet)."""
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=ROLLUP_COLUMNS).astype({c: "Int64" for c in COUNT_COLUMNS})
+    return _read(path, os.path.getmtime(path)).copy()
+
+
+def _write(path, table):
+    atomic_write(path, lambda tmp: table.to_csv(tmp, index=False))
+
+
+def replace_month(path, month, rows):
+    """Replace all rows of ``month`` with ``rows`` (a list of dicts)."""
+    new = pd.DataFrame(rows, columns=ROLLUP_COLUMNS)
+    new["Month"] = month
+    with _lock:
+        table = read_rollup(path)
+        table = table[table["Month"] != month]
+        table = pd.concat([table, new], ignore_index=True) if len(table) else new
+        _write(path, table.sort_values(["Month", "Metro Station"], kind="stable"))
+
+
+def drop_month(path, month):
+    """Remove a month's rows (e.g. after its data is deleted)."""
+    with _lock:
+        table = read_rollup(path)
+        if (table["Month"] == month).any():
+            _write(path, table[table["Month"] != month])
+
+
+def station_rows(table, station):
+    """Rows of one station (or ``ALL_STATIONS``) ordered by month."""
+    rows = table[table["Metro Station"] == station].sort_values("Month")
+    return rows.reset_index(drop=True)
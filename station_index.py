@@ -0,0 +1,128 @@
+"""Spatial index for matching ride coordinates to named stations/points."""
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+EARTH_RADIUS_M = 6371000
+METERS_PER_DEGREE = EARTH_RADIUS_M * np.pi / 180
+POINTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "metro_points.csv")
+DEFAULT_RADIUS_M = 1000
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Element-wise great-circle distance (meters) between coordinate arrays."""
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    dphi = np.radians(lat2 - lat1)
+    dlambda = np.radians(lon2 - lon1)
+    a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2) ** 2
+    return EARTH_RADIUS_M * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+class PointIndex:
+    """Grid index answering nearest-point-within-radius queries."""
+
+    def __init__(self, names, lats, lons, radius=DEFAULT_RADIUS_M):
+        self.names = np.array([str(n).strip() for n in names], dtype=object)
+        self.lats = np.asarray(lats, dtype=float)
+        self.lons = np.asarray(lons, dtype=float)
+        self.radius = float(radius)
+
+        # 1% slack so rounding never pushes a neighbour outside the 3x3 block
+        self._cell_lat = self.radius / METERS_PER_DEGREE * 1.01
+        max_lat = min(np.abs(self.lats).max() + self._cell_lat, 89.0) if len(self.lats) else 0.0
+        self._cell_lon = self._cell_lat / np.cos(np.radians(max_lat))
+        self._lat0 = (self.lats.min() if len(self.lats) else 0.0) - self._cell_lat
+        self._lon0 = (self.lons.min() if len(self.lons) else 0.0) - self._cell_lon
+
+        cy, cx = self._cells(self.lats, self.lons)
+        self._height = int(cy.max()) + 2 if len(cy) else 1
+        self._width = int(cx.max()) + 2 if len(cx) else 1
+        keys = cy * self._width + cx
+        # Stable sort keeps points of one cell in file order (tie-breaking)
+        self._order = np.argsort(keys, kind="stable")
+        self._keys = keys[self._order]
+        self._max_per_cell = int(np.unique(keys, return_counts=True)[1].max()) if len(keys) else 0
+
+    @classmethod
+    def from_dict(cls, points, radius=DEFAULT_RADIUS_M):
+        """Build from a ``{name: (lat, lon)}`` mapping."""
+        return cls(
+            list(points.keys()),
+            [c[0] for c in points.values()],
+            [c[1] for c in points.values()],
+            radius,
+        )
+
+    def __len__(self):
+        return len(self.names)
+
+    def _cells(self, lats, lons):
+        cy = np.floor((lats - self._lat0) / self._cell_lat).astype(np.int64)
+        cx = np.floor((lons - self._lon0) / self._cell_lon).astype(np.int64)
+        return cy, cx
+
+    def query(self, lats, lons, radius=None):
+        """Nearest point index and distance per coordinate pair; -1 and NaN where none is within ``radius``."""
+        radius = self.radius if radius is None else min(float(radius), self.radius)
+        lats = np.asarray(lats, dtype=float)
+        lons = np.asarray(lons, dtype=float)
+        n = len(lats)
+        best_idx = np.full(n, -1, dtype=np.int64)
+        best = np.full(n, np.inf)
+
+        valid = ~(np.isnan(lats) | np.isnan(lons))
+        rows = np.flatnonzero(valid)
+        if len(rows) and len(self):
+            q_lat, q_lon = lats[rows], lons[rows]
+            cy, cx = self._cells(q_lat, q_lon)
+            for dy in (-1, 0, 1):
+                for dx in (-1, 0, 1):
+                    y, x = cy + dy, cx + dx
+                    inside = (y >= 0) & (y < self._height) & (x >= 0) & (x < self._width)
+                    keys = np.where(inside, y * self._width + x, -1)
+                    lo = np.searchsorted(self._keys, keys, side="left")
+                    count = np.searchsorted(self._keys, keys, side="right") - lo
+                    for k in range(self._max_per_cell):
+                        m = np.flatnonzero(inside & (count > k))
+                        if not len(m):
+                            break
+                        cand = self._order[lo[m] + k]
+                        d = haversine(q_lat[m], q_lon[m], self.lats[cand], self.lons[cand])
+                        r = rows[m]
+                        better = (d < best[r]) | ((d == best[r]) & (cand < best_idx[r]))
+                        best[r[better]] = d[better]
+                        best_idx[r[better]] = cand[better]
+
+        miss = best > radius
+        best_idx[miss] = -1
+        best[miss] = np.nan
+        return best_idx, best
+
+    def nearest_names(self, lats, lons, radius=None):
+        """Nearest point name per coordinate pair, ``None`` when out of range."""
+        idx, _ = self.query(lats, lons, radius)
+        out = np.full(len(idx), None, dtype=object)
+        hit = idx >= 0
+        out[hit] = self.names[idx[hit]]
+        return out
+
+
+def read_points(path=POINTS_FILE):
+    """Read a Name/Lat/Lon points file (as exported, with a UTF-8 BOM)."""
+    pts = pd.read_csv(path, encoding="utf-8-sig")
+    pts.columns = pts.columns.str.strip()
+    pts = pts.dropna(subset=["Lat", "Lon"])
+    return pts
+
+
+@lru_cache(maxsize=8)
+def _cached_index(path, mtime, radius):
+    pts = read_points(path)
+    return PointIndex(pts["Name"], pts["Lat"], pts["Lon"], radius)
+
+
+def load_point_index(path=POINTS_FILE, radius=DEFAULT_RADIUS_M):
+    """Index for a points file, built once per file version and radius."""
+    return _cached_index(os.path.abspath(path), os.path.getmtime(path), float(radius))
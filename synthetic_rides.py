@@ -0,0 +1,186 @@
+"""Synthetic monthly ride data for benchmarks and load tests."""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+import station_index
+from station_index import read_points
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+POINTS_FILE = station_index.POINTS_FILE
+STATIONS_FILE = os.path.join(HERE, "metro_stations.csv")
+DEFAULT_CHUNK_ROWS = 500_000
+
+# Default station keywords of the dashboard and the points file row they sit at
+STATION_KEYWORDS = {
+    "كليه البنات": "Koleyat El Banat",
+    "صفاء": None,
+    "الاهرام": "Al Ahram",
+    "هليوبوليس": "Heliopolis",
+    "الف مسكن": "Alf Maskan",
+    "هارون": "Haroun",
+}
+STATION_TEMPLATES = ["محطة {}", "مترو {}", "محطة مترو {}", "{} 1", "{} 2"]
+STATION_SHARE = 0.6        # rides starting/ending at a metro station
+MISSING_PLACE_SHARE = 0.01
+MISSING_COORD_SHARE = 0.03
+STRAY_COORD_SHARE = 0.05   # coordinates nowhere near a known place
+COORD_NOISE_DEG = 0.0004   # ~40 m
+RIDES_PER_USER = 4
+NEW_USER_SHARE = 0.15
+
+# Share of rides per hour of day: morning and evening commute peaks
+HOUR_WEIGHTS = np.array([
+    1, 0.5, 0.3, 0.2, 0.2, 0.5, 2, 5, 8, 7, 5, 4,
+    4, 4, 5, 6, 7, 8, 8, 6, 4, 3, 2, 1.5,
+])
+
+
+def load_places(points_file=POINTS_FILE, stations_file=STATIONS_FILE):
+    """``(labels, lats, lons, is_station)`` of every place a ride can start or end at."""
+    points = read_points(points_file)
+    coords = {name.strip(): (lat, lon) for name, lat, lon in zip(points["Name"], points["Lat"], points["Lon"])}
+    try:
+        stations = pd.read_csv(stations_file)
+        for name, lat, lon in zip(stations["Station"], stations["Lat"], stations["Lon"]):
+            coords.setdefault(name.strip(), (lat, lon))
+    except (OSError, KeyError):
+        pass
+    centre = (points["Lat"].mean(), points["Lon"].mean())
+
+    labels, lats, lons, is_station = [], [], [], []
+    for keyword, name in STATION_KEYWORDS.items():
+        lat, lon = coords.get(name, centre)
+        for template in STATION_TEMPLATES:
+            labels.append(template.format(keyword))
+            lats.append(lat)
+            lons.append(lon)
+            is_station.append(True)
+    for name, lat, lon in zip(points["Name"], points["Lat"], points["Lon"]):
+        if name.strip() in STATION_KEYWORDS.values():
+            continue
+        labels.append(name.strip())
+        lats.append(lat)
+        lons.append(lon)
+        is_station.append(False)
+    return np.array(labels, dtype=object), np.array(lats), np.array(lons), np.array(is_station)
+
+
+class RideGenerator:
+    """Seeded generator of one month of rides, produced chunk by chunk."""
+
+    def __init__(self, n_rows, month="2025-11", seed=0):
+        self.n_rows = int(n_rows)
+        self.period = pd.Period(month, freq="M")
+        self.rng = np.random.default_rng(seed)
+        self.labels, self.lats, self.lons, is_station = load_places()
+
+        weights = np.where(is_station, STATION_SHARE / is_station.sum(), (1 - STATION_SHARE) / (~is_station).sum())
+        self.place_weights = weights / weights.sum()
+
+        # A fixed user population: a few heavy riders, many occasional ones
+        n_users = max(1, self.n_rows // RIDES_PER_USER)
+        self.user_ids = 100_000 + np.cumsum(self.rng.integers(1, 20, n_users))
+        activity = self.rng.lognormal(0, 1.2, n_users)
+        self.user_weights = activity / activity.sum()
+        month_start = self.period.start_time
+        new = self.rng.random(n_users) < NEW_USER_SHARE
+        days_before = self.rng.integers(1, 365, n_users)
+        days_into = self.rng.integers(0, self.period.days_in_month, n_users)
+        self.signups = month_start + pd.to_timedelta(np.where(new, days_into, -days_before), unit="D")
+
+    def _places(self, n):
+        idx = self.rng.choice(len(self.labels), n, p=self.place_weights)
+        text = self.labels[idx]
+        text[self.rng.random(n) < MISSING_PLACE_SHARE] = None
+
+        lat = self.lats[idx] + self.rng.normal(0, COORD_NOISE_DEG, n)
+        lon = self.lons[idx] + self.rng.normal(0, COORD_NOISE_DEG, n)
+        stray = self.rng.random(n) < STRAY_COORD_SHARE
+        lat[stray] += self.rng.uniform(-0.05, 0.05, stray.sum())
+        lon[stray] += self.rng.uniform(-0.05, 0.05, stray.sum())
+        missing = self.rng.random(n) < MISSING_COORD_SHARE
+        lat[missing] = np.nan
+        lon[missing] = np.nan
+        return text, lat, lon
+
+    def chunk(self, n):
+        """``n`` rides with the columns of an operator export."""
+        rng = self.rng
+        start, start_lat, start_lon = self._places(n)
+        end, end_lat, end_lon = self._places(n)
+        user = rng.choice(len(self.user_ids), n, p=self.user_weights)
+
+        day = rng.integers(0, self.period.days_in_month, n)
+        hour = rng.choice(24, n, p=HOUR_WEIGHTS / HOUR_WEIGHTS.sum())
+        seconds = rng.integers(0, 3600, n)
+        started = self.period.start_time + pd.to_timedelta(day * 86400 + hour * 3600 + seconds, unit="s")
+        # A new user's rides never come before their signup day
+        signup = self.signups[user]
+        started = pd.DatetimeIndex(np.maximum(started.to_numpy(), signup.to_numpy()))
+
+        duration = np.round(rng.gamma(2.0, 6.0, n) + 1, 2)
+        rating = rng.choice([0, 1, 2, 3, 4, 5], n, p=[0.4, 0.03, 0.03, 0.08, 0.16, 0.3]).astype(float)
+        rating[rng.random(n) < 0.02] = np.nan
+
+        return pd.DataFrame({
+            "Start": start,
+            "End": end,
+            "User Id": self.user_ids[user],
+            "Signup Local Date": signup.normalize(),
+            "Start Date Local": started,
+            "Duration": duration,
+            "Rating": rating,
+            "Start Lat": start_lat,
+            "Start Long": start_lon,
+            "Stop Lat": end_lat,
+            "Stop Long": end_lon,
+        })
+
+    def chunks(self, chunk_rows=DEFAULT_CHUNK_ROWS):
+        """Yield the month in chunks of at most ``chunk_rows`` rides."""
+        for lo in range(0, self.n_rows, chunk_rows):
+            yield self.chunk(min(chunk_rows, self.n_rows - lo))
+
+
+def make_rides(n_rows, month="2025-11", seed=0):
+    """One month of ``n_rows`` synthetic rides as a single DataFrame."""
+    chunks = list(RideGenerator(n_rows, month, seed).chunks())
+    return pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+
+
+def write_rides(path, n_rows, month="2025-11", seed=0, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Write synthetic rides to .csv, .parquet or .xlsx, a chunk at a time where possible."""
+    generator = RideGenerator(n_rows, month, seed)
+    if path.endswith(".csv"):
+        for i, chunk in enumerate(generator.chunks(chunk_rows)):
+            chunk.to_csv(path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+    elif path.endswith(".parquet"):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer = None
+        for chunk in generator.chunks(chunk_rows):
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table.cast(writer.schema))
+        if writer is not None:
+            writer.close()
+    elif path.endswith(".xlsx"):
+        make_rides(n_rows, month, seed).to_excel(path, index=False)
+    else:
+        raise ValueError(f"Unsupported output format: {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic monthly ride data.")
+    parser.add_argument("rows", type=int, help="number of rides, e.g. 10000 to 10000000")
+    parser.add_argument("--month", default="2025-11")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", required=True, help="output file (.csv, .parquet or .xlsx)")
+    args = parser.parse_args()
+    write_rides(args.out, args.rows, args.month, args.seed)
+    print(f"Wrote {args.rows:,} rides for {args.month} to {args.out}")
@@ -0,0 +1,35 @@
+import io
+import os
+import sys
+
+import pytest
+
+# The app is a folder of flat modules, not an installed package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metro_core as core  # noqa: E402
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    previous = core.BASE_DATA_DIR
+    core.configure(str(tmp_path / "data"))
+    core.ensure_dirs()
+    yield core.BASE_DATA_DIR
+    core.configure(previous)
+    core.clear_caches()
+
+
+@pytest.fixture
+def upload():
+    """Store a ride frame through the sidebar's ingestion path."""
+    def upload(df, month, ext="csv", **kwargs):
+        buf = io.BytesIO()
+        if ext == "csv":
+            buf.write(df.to_csv(index=False).encode("utf-8"))
+        else:
+            df.to_excel(buf, index=False)
+        buf.seek(0)
+        ok, error, _ = core.ingest_upload(buf, ext, month, **kwargs)
+        assert ok, error
+    return upload
@@ -0,0 +1,128 @@
+import io
+import math
+
+import numpy as np
+import openpyxl
+import pandas as pd
+import pytest
+
+import metro_core as core
+from synthetic_rides import make_rides
+
+MONTH = "2025-03"
+OVERLAPPING_STATIONS = {**core.DEFAULT_STATIONS, "Metro": "مترو"}
+
+
+def rides(n=3000, seed=1):
+    """Synthetic rides with the gaps real exports have (no date, duration or rating)."""
+    df = make_rides(n, MONTH, seed)
+    rng = np.random.default_rng(seed)
+    df.loc[rng.random(n) < 0.02, core.START_DATE_COL] = pd.NaT
+    df.loc[rng.random(n) < 0.02, core.DURATION_COL] = np.nan
+    df.loc[rng.random(n) < 0.02, core.RATING_COL] = 9.0
+    return df
+
+
+def baseline_metrics(df, month):
+    """Station metrics as the original dashboard computed them, straight from the rows."""
+    df = core.clean_df(df.copy())
+    out = {}
+    for station, keyword in core.STATIONS.items():
+        in_start = df[core.START_COL].astype(str).str.contains(keyword, na=False, case=False)
+        in_end = df[core.END_COL].astype(str).str.contains(keyword, na=False, case=False)
+        riders = df[in_start]
+        rides_per_user = riders.groupby(core.USER_COL).size()
+        ratings = riders[core.RATING_COL]
+        ratings = ratings[ratings.between(core.MIN_RATING, core.MAX_RATING)]
+        new = riders[riders[core.SIGNUP_COL].dt.to_period("M") == pd.Period(month)]
+        dated = riders[core.START_DATE_COL].dropna()
+        heat = np.zeros((7, 24), dtype=np.int64)
+        np.add.at(heat, ((dated.dt.dayofweek.to_numpy() + 1) % 7, dated.dt.hour.to_numpy()), 1)
+        out[station] = {
+            "total_starts": len(riders),
+            "total_ends": int(in_end.sum()),
+            "started_ended": int((in_start & in_end).sum()),
+            "total_riders": riders[core.USER_COL].nunique(),
+            "new_signups": new[core.USER_COL].nunique(),
+            "one_time": int((rides_per_user == 1).sum()),
+            "light": int(rides_per_user.between(core.LIGHT_USER_MIN, core.LIGHT_USER_MAX).sum()),
+            "heavy": int((rides_per_user >= core.HEAVY_USER_MIN).sum()),
+            "avg_duration": riders[core.DURATION_COL].mean(),
+            "avg_rating": ratings.mean() if len(ratings) else None,
+            "total_ratings": len(ratings),
+            "heat": heat,
+        }
+    return out
+
+
+def assert_close(actual, expected, path="summary"):
+    """Structural equality; floats only up to summation order."""
+    if isinstance(expected, dict):
+        assert set(actual) == set(expected), path
+        for key in expected:
+            assert_close(actual[key], expected[key], f"{path}[{key!r}]")
+    elif isinstance(expected, (list, tuple, np.ndarray)):
+        assert len(actual) == len(expected), path
+        for i, (a, e) in enumerate(zip(actual, expected)):
+            assert_close(a, e, f"{path}[{i}]")
+    elif isinstance(expected, float) and not isinstance(actual, (int, np.integer)):
+        if math.isnan(expected):
+            assert math.isnan(actual), path
+        elif "_by_day" in path:
+            # Daily averages are rounded to cents; a sum on a half cent may round either way
+            assert actual == pytest.approx(expected, abs=0.0100001), path
+        else:
+            assert actual == pytest.approx(expected, rel=1e-12), path
+    else:
+        assert actual == expected, path
+
+
+def build(tmp_path, upload, name, parts, ext="csv", chunk_rows=core.INGEST_CHUNK_ROWS):
+    """Month summary and workbook cells after uploading ``parts`` (the first replaces, the rest append)."""
+    core.configure(str(tmp_path / name))
+    core.ensure_dirs()
+    for i, df in enumerate(parts):
+        upload(df, MONTH, ext, chunk_rows=chunk_rows, append=i > 0)
+    summary = core.month_summary(MONTH)
+    workbook = openpyxl.load_workbook(io.BytesIO(core.build_month_report(MONTH)))
+    cells = {
+        (ws.title, c.coordinate): c.value
+        for ws in workbook.worksheets for row in ws.iter_rows() for c in row if c.value is not None
+    }
+    return summary, cells
+
+
+@pytest.fixture(params=["default", "overlapping"])
+def stations(request, monkeypatch):
+    monkeypatch.setattr(core, "STATIONS", OVERLAPPING_STATIONS if request.param == "overlapping" else dict(core.DEFAULT_STATIONS))
+
+
+@pytest.fixture
+def single(tmp_path, data_dir, upload, stations):
+    df = rides()
+    return df, build(tmp_path, upload, "single", [df])
+
+
+def test_single_pass_matches_baseline(single):
+    df, (summary, _) = single
+    for station, expected in baseline_metrics(df, MONTH).items():
+        heat = expected.pop("heat")
+        actual = {k: summary["stations"][station][k] for k in expected}
+        assert_close(actual, expected, station)
+        stored = summary["heatmaps"][station]
+        np.testing.assert_array_equal(stored if stored is not None else np.zeros((7, 24)), heat)
+    assert summary["overall"]["Total Rides"] == len(df)
+    assert summary["overall"]["Unique Users"] == df[core.USER_COL].nunique()
+
+
+@pytest.mark.parametrize("variant", ["chunked", "append", "xlsx"])
+def test_variants_match_single_pass(tmp_path, upload, single, variant):
+    df, (expected, expected_cells) = single
+    if variant == "chunked":
+        summary, cells = build(tmp_path, upload, variant, [df], chunk_rows=777)
+    elif variant == "append":
+        summary, cells = build(tmp_path, upload, variant, [df.iloc[:1800], df.iloc[1800:2500], df.iloc[2500:]], chunk_rows=500)
+    else:
+        summary, cells = build(tmp_path, upload, variant, [df], ext="xlsx", chunk_rows=1000)
+    assert_close(summary, expected)
+    assert_close(cells, expected_cells, "workbook")
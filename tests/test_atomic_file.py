@@ -0,0 +1,34 @@
+import os
+
+import pytest
+
+from atomic_file import atomic_write
+
+
+def write_text(text):
+    def write(tmp):
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+    return write
+
+
+def test_replaces_file_and_creates_folder(tmp_path):
+    path = str(tmp_path / "a" / "b.txt")
+    assert atomic_write(path, write_text("one")) == path
+    atomic_write(path, write_text("two"))
+    assert open(path, encoding="utf-8").read() == "two"
+    assert os.listdir(tmp_path / "a") == ["b.txt"]
+
+
+def test_failed_write_keeps_old_file(tmp_path):
+    path = str(tmp_path / "b.txt")
+    atomic_write(path, write_text("one"))
+
+    def fail(tmp):
+        write_text("partial")(tmp)
+        raise RuntimeError("disk full")
+
+    with pytest.raises(RuntimeError):
+        atomic_write(path, fail)
+    assert open(path, encoding="utf-8").read() == "one"
+    assert os.listdir(tmp_path) == ["b.txt"]
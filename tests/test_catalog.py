@@ -0,0 +1,39 @@
+import os
+
+import metro_core as core
+import month_store
+from synthetic_rides import make_rides
+
+
+def test_delete_month_reindexes_catalog(data_dir, upload):
+    for i, month in enumerate(["2025-02", "2025-03"]):
+        upload(make_rides(1000, month, i), month)
+    core.load_rollup()
+    assert core.get_uploaded_months() == ["2025-02", "2025-03"]
+
+    core.delete_month("2025-02")
+    assert core.get_uploaded_months() == ["2025-03"]
+    assert core.CATALOG.entry("2025-02") is None
+    assert core.month_file_fingerprint("2025-02") is None
+    assert not os.path.exists(os.path.join(data_dir, "_aggregates", "2025-02"))
+    assert set(core.load_rollup()["Month"]) == {"2025-03"}
+
+
+def test_files_removed_behind_the_apps_back_are_dropped(data_dir, upload):
+    upload(make_rides(1000, "2025-02", 1), "2025-02")
+    upload(make_rides(1000, "2025-03", 2), "2025-03")
+    entry = core.CATALOG.entry("2025-03")
+
+    os.remove(month_store.month_path(data_dir, "2025-02"))
+    assert core.get_uploaded_months() == ["2025-03"]
+    # Unchanged months keep their entry (and are not re-hashed)
+    assert core.CATALOG.entry("2025-03")["files"] == entry["files"]
+
+
+def test_append_changes_the_fingerprint(data_dir, upload):
+    upload(make_rides(1000, "2025-03", 1), "2025-03")
+    before = core.CATALOG.entry("2025-03")
+    upload(make_rides(200, "2025-03", 2), "2025-03", append=True)
+    after = core.CATALOG.entry("2025-03")
+    assert after["hash"] != before["hash"]
+    assert after["rows"] == 1200 and len(after["files"]) == 2
@@ -0,0 +1,29 @@
+import pandas as pd
+
+import metro_core as core
+import month_store
+from synthetic_rides import make_rides
+
+MONTH = "2025-03"
+
+
+def test_append_without_coordinates_reads_back(data_dir, upload):
+    upload(make_rides(1000, MONTH, 1), MONTH)
+    drop = make_rides(200, MONTH, 2)
+    drop = drop.drop(columns=[c for c in drop.columns if "Lat" in c or "Long" in c])
+    upload(drop, MONTH, append=True)
+
+    rows = core.read_month_rows(MONTH)
+    assert len(rows) == 1200
+    stored = month_store.read_month(data_dir, MONTH)
+    assert isinstance(stored["Start Point"].dtype, pd.CategoricalDtype)
+    assert stored["Start Point"].iloc[1000:].isna().all()
+
+
+def test_concat_parts_aligns_category_dtypes():
+    main = pd.DataFrame({"Point": pd.Categorical(["a", "b"], categories=pd.Index(["a", "b"], dtype="str"))})
+    delta = pd.DataFrame({"Point": pd.Categorical([None, "b"], categories=pd.Index(["b"], dtype=object))})
+    out = month_store._concat_parts([main, delta])
+    assert out["Point"].cat.categories.dtype == main["Point"].cat.categories.dtype
+    assert out["Point"].isna().tolist() == [False, False, True, False]
+    assert out["Point"].iloc[3] == "b"
@@ -0,0 +1,39 @@
+import pandas as pd
+
+import metro_core as core
+import rollup
+from synthetic_rides import make_rides
+
+MONTHS = ["2025-02", "2025-03"]
+
+
+def heavy_users(table):
+    rows = table[table["Metro Station"] != rollup.ALL_STATIONS]
+    return dict(zip(zip(rows["Month"], rows["Metro Station"]), rows["Heavy Users"].astype(int)))
+
+
+def test_rollup_rebuilt_when_heavy_threshold_changes(data_dir, upload, monkeypatch):
+    for i, month in enumerate(MONTHS):
+        upload(make_rides(3000, month, i), month)
+    before = core.load_rollup()
+    assert (before["Heavy User Min Rides"] == core.HEAVY_USER_MIN).all()
+
+    monkeypatch.setattr(core, "HEAVY_USER_MIN", 3)
+    after = core.load_rollup()
+    assert (after["Heavy User Min Rides"] == 3).all()
+    assert sorted(after["Month"].unique()) == MONTHS
+    for (month, station), heavy in heavy_users(after).items():
+        assert heavy == core.month_summary(month)["stations"][station]["heavy"]
+    assert sum(heavy_users(after).values()) > sum(heavy_users(before).values())
+
+
+def test_rollup_without_threshold_column_is_rebuilt(data_dir, upload):
+    upload(make_rides(2000, MONTHS[0], 1), MONTHS[0])
+    table = core.load_rollup()
+    table.drop(columns=["Heavy User Min Rides"]).to_csv(core.ROLLUP_FILE, index=False)
+
+    rebuilt = core.load_rollup()
+    assert len(rebuilt) == len(table)
+    assert (rebuilt["Heavy User Min Rides"] == core.HEAVY_USER_MIN).all()
+    stored = pd.read_csv(core.ROLLUP_FILE)
+    assert stored["Heavy User Min Rides"].notna().all()
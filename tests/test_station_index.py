@@ -0,0 +1,76 @@
+import math
+
+import numpy as np
+import pytest
+
+from station_index import EARTH_RADIUS_M, PointIndex, load_point_index
+
+
+def scalar_haversine(lat1, lon1, lat2, lon2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (
+        math.sin(math.radians(lat2 - lat1) / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+    )
+    return EARTH_RADIUS_M * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def brute_force(names, lats, lons, q_lats, q_lons, radius):
+    """Nearest name within ``radius`` for each query by checking every point; ties go to the earlier point."""
+    out = []
+    for q_lat, q_lon in zip(q_lats, q_lons):
+        if math.isnan(q_lat) or math.isnan(q_lon):
+            out.append(None)
+            continue
+        best, best_name = math.inf, None
+        for name, lat, lon in zip(names, lats, lons):
+            d = scalar_haversine(q_lat, q_lon, lat, lon)
+            if d < best:
+                best, best_name = d, name
+        out.append(best_name if best <= radius else None)
+    return out
+
+
+@pytest.mark.parametrize("radius", [50, 150, 1000])
+def test_nearest_names_match_brute_force(radius):
+    rng = np.random.default_rng(radius)
+    names = [f"P{i}" for i in range(300)]
+    lats = 30.0 + rng.random(300) * 0.1
+    lons = 31.2 + rng.random(300) * 0.1
+    q_lats = 29.99 + rng.random(2000) * 0.12
+    q_lons = 31.19 + rng.random(2000) * 0.12
+    q_lats[::97] = np.nan
+    q_lons[::89] = np.nan
+
+    index = PointIndex(names, lats, lons, radius)
+    expected = brute_force(names, lats, lons, q_lats, q_lons, radius)
+    assert index.nearest_names(q_lats, q_lons).tolist() == expected
+
+
+def test_ties_resolve_to_the_earlier_point():
+    # Duplicate coordinates, and two points mirrored around the query longitude
+    # (offsets exact in binary, so both distances are bit-identical)
+    names = ["A", "B", "C", "D"]
+    lats = [30.05, 30.05, 30.125, 30.125]
+    lons = [31.25, 31.25, 31.5 + 2 ** -9, 31.5 - 2 ** -9]
+    index = PointIndex(names, lats, lons, 500)
+    q_lats, q_lons = [30.05, 30.125], [31.25, 31.5]
+    assert index.nearest_names(q_lats, q_lons).tolist() == ["A", "C"]
+    assert brute_force(names, lats, lons, q_lats, q_lons, 500) == ["A", "C"]
+
+
+def test_missing_and_out_of_range_coordinates():
+    index = PointIndex(["A"], [30.0], [31.0], 100)
+    names = index.nearest_names([np.nan, 30.0, 30.0, 30.5], [31.0, np.nan, 31.0, 31.0])
+    assert names.tolist() == [None, None, "A", None]
+    idx, dist = index.query([30.5], [31.0])
+    assert idx.tolist() == [-1] and np.isnan(dist).all()
+
+
+def test_points_file_matches_brute_force():
+    index = load_point_index(radius=150)
+    rng = np.random.default_rng(0)
+    q_lats = np.quantile(index.lats, [0, 1]).mean() + (rng.random(500) - 0.5) * 0.1
+    q_lons = np.quantile(index.lons, [0, 1]).mean() + (rng.random(500) - 0.5) * 0.1
+    expected = brute_force(index.names, index.lats, index.lons, q_lats, q_lons, 150)
+    assert index.nearest_names(q_lats, q_lons).tolist() == expected
@@ -0,0 +1,171 @@
+"""Mergeable distinct-user structures for cross-month rider questions."""
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+try:
+    from pyroaring import BitMap64
+except ImportError:
+    BitMap64 = None
+
+HLL_PRECISION = 12          # 4096 one-byte registers, ~1.6% standard error
+
+
+def _sorted_unique(codes):
+    # Sort-based; np.unique hashes large integer arrays, which is slower here
+    codes = np.sort(np.asarray(codes, dtype=np.uint64))
+    if len(codes) < 2:
+        return codes
+    return codes[np.concatenate([[True], codes[1:] != codes[:-1]])]
+
+
+def user_codes(ids):
+    """Unique ``uint64`` codes of the non-null user ids in ``ids``."""
+    values = pd.Series(ids).dropna()
+    if pd.api.types.is_integer_dtype(values) and (values >= 0).all():
+        return _sorted_unique(values.to_numpy(dtype=np.uint64))
+    values = values.astype(object).unique()
+    numeric = pd.to_numeric(pd.Series(values), errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    whole = (numeric >= 0) & (numeric < 2**63) & (numeric % 1 == 0)
+    codes = np.empty(len(values), dtype=np.uint64)
+    codes[whole] = numeric[whole].astype(np.uint64)
+    codes[~whole] = [
+        int.from_bytes(hashlib.blake2b(str(v).encode("utf-8"), digest_size=8).digest(), "little") | (1 << 63)
+        for v in values[~whole]
+    ]
+    return _sorted_unique(codes)
+
+
+def _mix(codes):
+    """splitmix64 finalizer: spreads user codes uniformly over 64 bits."""
+    with np.errstate(over="ignore"):
+        z = codes.astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return z ^ (z >> np.uint64(31))
+
+
+def _bit_length(x):
+    n = np.zeros(x.shape, dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        big = x >= np.uint64(1 << shift)
+        n += big * shift
+        x = np.where(big, x >> np.uint64(shift), x)
+    return n + (x > 0)
+
+
+class HyperLogLog:
+    """Fixed-size distinct-count sketch; merging is a register-wise max."""
+
+    def __init__(self, precision=HLL_PRECISION, registers=None):
+        self.precision = precision
+        if registers is None:
+            registers = np.zeros(1 << precision, dtype=np.uint8)
+        self.registers = registers
+
+    @classmethod
+    def from_codes(cls, codes, precision=HLL_PRECISION):
+        sketch = cls(precision)
+        if len(codes):
+            h = _mix(np.asarray(codes, dtype=np.uint64))
+            index = (h >> np.uint64(64 - precision)).astype(np.intp)
+            rest = h & np.uint64((1 << (64 - precision)) - 1)
+            rank = (64 - precision) - _bit_length(rest) + 1
+            np.maximum.at(sketch.registers, index, rank.astype(np.uint8))
+        return sketch
+
+    def __or__(self, other):
+        return HyperLogLog(self.precision, np.maximum(self.registers, other.registers))
+
+    def estimate(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int((self.registers == 0).sum())
+        if raw <= 2.5 * m and zeros:
+            return m * np.log(m / zeros)   # linear counting for small sets
+        return float(raw)
+
+
+def _bitmap(codes):
+    return BitMap64(codes.tolist()) if BitMap64 is not None else codes
+
+
+def _bitmap_codes(bits):
+    if BitMap64 is not None:
+        return np.fromiter(bits, dtype=np.uint64, count=len(bits))
+    return bits
+
+
+class UserSet:
+    """Exact set of user codes (roaring bitmap or sorted array) plus its sketch."""
+
+    def __init__(self, codes=(), sketch=None):
+        codes = _sorted_unique(codes)
+        self._bits = _bitmap(codes)
+        self.sketch = sketch if sketch is not None else HyperLogLog.from_codes(codes)
+
+    @classmethod
+    def from_ids(cls, ids):
+        return cls(user_codes(ids))
+
+    @classmethod
+    def _wrap(cls, bits, sketch=None):
+        users = cls.__new__(cls)
+        users._bits = bits
+        users.sketch = sketch if sketch is not None else HyperLogLog.from_codes(_bitmap_codes(bits))
+        return users
+
+    def codes(self):
+        """Sorted ``uint64`` array of the members."""
+        return _bitmap_codes(self._bits)
+
+    def __len__(self):
+        return len(self._bits)
+
+    def __or__(self, other):
+        if BitMap64 is not None:
+            return UserSet._wrap(self._bits | other._bits, self.sketch | other.sketch)
+        return UserSet._wrap(_sorted_unique(np.concatenate([self._bits, other._bits])), self.sketch | other.sketch)
+
+    def __and__(self, other):
+        if BitMap64 is not None:
+            return UserSet._wrap(self._bits & other._bits)
+        return UserSet._wrap(np.intersect1d(self._bits, other._bits, assume_unique=True))
+
+    def __sub__(self, other):
+        if BitMap64 is not None:
+            return UserSet._wrap(self._bits - other._bits)
+        return UserSet._wrap(np.setdiff1d(self._bits, other._bits, assume_unique=True))
+
+    def estimate(self):
+        """Approximate size from the HyperLogLog sketch."""
+        return self.sketch.estimate()
+
+    def __getstate__(self):
+        if BitMap64 is not None:
+            bits = ("roaring", self._bits.serialize())
+        else:
+            bits = ("array", self._bits)
+        return {"bits": bits, "registers": self.sketch.registers, "precision": self.sketch.precision}
+
+    def __setstate__(self, state):
+        kind, bits = state["bits"]
+        if kind == "roaring":
+            if BitMap64 is None:
+                # A cache written with pyroaring; the caller treats this as a miss
+                raise ImportError("pyroaring is needed to read this user set")
+            bits = BitMap64.deserialize(bits)
+        elif BitMap64 is not None:
+            bits = BitMap64(bits.tolist())
+        self._bits = bits
+        self.sketch = HyperLogLog(state["precision"], state["registers"])
+
+
+def union(sets):
+    """Union of several user sets (empty set for none)."""
+    total = UserSet()
+    for users in sets:
+        total = total | users
+    return total
@@ -0,0 +1,116 @@
+"""Fast, streaming reader for monthly .xlsx ride exports."""
+import sys
+import time
+
+import pandas as pd
+
+DEFAULT_CHUNK_ROWS = 100_000
+
+
+def normalize_header(name):
+    """Header cell as the dashboard names columns (no NBSP, stripped)."""
+    if name is None:
+        return ""
+    return str(name).replace("\xa0", " ").strip()
+
+
+def _calamine_rows(source):
+    try:
+        from python_calamine import CalamineWorkbook
+    except ImportError:
+        return None
+    if hasattr(source, "read"):
+        workbook = CalamineWorkbook.from_filelike(source)
+    else:
+        workbook = CalamineWorkbook.from_path(source)
+    sheet = workbook.get_sheet_by_index(0)
+    return sheet.iter_rows()
+
+
+def _openpyxl_rows(source):
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    sheet = workbook.worksheets[0]
+    try:
+        yield from sheet.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def iter_rows(source, engine=None):
+    """Row tuples of the first sheet; ``engine`` is "calamine", "openpyxl" or None (best available)."""
+    if engine in (None, "calamine"):
+        rows = _calamine_rows(source)
+        if rows is not None:
+            return rows
+        if engine == "calamine":
+            raise ImportError("python-calamine is not installed")
+    return _openpyxl_rows(source)
+
+
+def read_header(source, engine=None):
+    """Normalized column names from the first row."""
+    for row in iter_rows(source, engine):
+        return [normalize_header(v) for v in row]
+    return []
+
+
+def iter_chunks(source, columns=None, chunk_rows=DEFAULT_CHUNK_ROWS, engine=None):
+    """Yield DataFrame chunks of the first sheet, optionally only ``columns``."""
+    rows = iter(iter_rows(source, engine))
+    header = [normalize_header(v) for v in next(rows, [])]
+    if columns is None:
+        keep = [i for i, name in enumerate(header) if name]
+    else:
+        wanted = set(columns)
+        keep = [i for i, name in enumerate(header) if name in wanted]
+    names = [header[i] for i in keep]
+
+    batch = []
+    for row in rows:
+        # calamine reports empty cells as "" where openpyxl gives None
+        values = [row[i] if i < len(row) and row[i] != "" else None for i in keep]
+        if all(v is None for v in values):
+            continue
+        batch.append(values)
+        if len(batch) >= chunk_rows:
+            yield pd.DataFrame(batch, columns=names)
+            batch = []
+    if batch or not names:
+        yield pd.DataFrame(batch, columns=names)
+
+
+def read_xlsx(source, columns=None, engine=None):
+    """Whole first sheet (optionally only ``columns``) as one DataFrame."""
+    chunks = list(iter_chunks(source, columns, engine=engine))
+    if not chunks:
+        return pd.DataFrame(columns=list(columns or []))
+    return pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+
+
+def compare(path, columns=None):
+    """Time ``pd.read_excel`` against the streaming readers; returns seconds per reader."""
+    timings = {}
+    start = time.perf_counter()
+    pd.read_excel(path)
+    timings["pd.read_excel"] = time.perf_counter() - start
+
+    for engine in ("openpyxl", "calamine"):
+        try:
+            start = time.perf_counter()
+            read_xlsx(path, columns, engine=engine)
+            timings[f"streaming ({engine})"] = time.perf_counter() - start
+        except ImportError:
+            continue
+    return timings
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("usage: python xlsx_reader.py FILE.xlsx [COLUMN ...]")
+        sys.exit(1)
+    results = compare(sys.argv[1], sys.argv[2:] or None)
+    baseline = results["pd.read_excel"]
+    for name, seconds in results.items():
+        print(f"{name:<24} {seconds:8.2f}s  ({baseline / seconds:4.1f}x)")